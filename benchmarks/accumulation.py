@@ -0,0 +1,78 @@
+"""
+Compare the old pd.concat-in-loop accumulation of standings responses with
+the record list used by DataBaseManager, over the full 1950-present history
+
+Usage: python benchmarks/accumulation.py [data folder]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from manager.database import DataBaseManager
+
+
+def build_responses(driver_standings: pd.DataFrame) -> list[tuple[int, int, dict]]:
+    # Uma resposta no formato da Jolpica para cada (season, round) do histórico
+    responses = []
+    for (season, round), group in driver_standings.groupby(['season', 'round']):
+        standings = [
+            {
+                'position': str(int(row.position)),
+                'points': str(row.points),
+                'wins': str(row.wins),
+                'Driver': {'driverId': row.driverId},
+                'Constructors': [{'constructorId': row.constructorId}],
+            }
+            for row in group.itertuples()
+        ]
+        responses.append((season, round, {'MRData': {'StandingsTable': {'StandingsLists': [{'DriverStandings': standings}]}}}))
+    return responses
+
+
+def concat_loop(responses):
+    j_drivers_standing = pd.DataFrame()
+    for season, round, temp in responses:
+        temp_df = pd.DataFrame(temp['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings'])
+        temp_df['season'] = season
+        temp_df['round'] = round
+        temp_df['driverId'] = temp_df['Driver'].apply(lambda x: x['driverId'])
+        temp_df['constructorId'] = temp_df['Constructors'].apply(lambda x: x[0]['constructorId'])
+        j_drivers_standing = pd.concat([
+            j_drivers_standing,
+            temp_df
+        ], ignore_index=True)
+    return j_drivers_standing[['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'wins']]
+
+
+def records(responses):
+    records = [
+        record
+        for season, round, temp in responses
+        for record in DataBaseManager.driver_standings_records(season, round, temp)
+    ]
+    return pd.DataFrame(records, columns=DataBaseManager.DRIVER_STANDINGS_COLUMNS).astype(DataBaseManager.STANDINGS_DTYPES)
+
+
+def measure(function, responses) -> tuple[float, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(responses)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20, len(result)
+
+
+if __name__ == '__main__':
+    data_folder = sys.argv[1] if len(sys.argv) > 1 else 'static/data'
+    driver_standings = pd.read_csv(os.path.join(data_folder, 'driver_standings.csv')).dropna(subset=['position'])
+    responses = build_responses(driver_standings)
+    print(f"{len(responses)} rounds, {len(driver_standings)} rows")
+
+    for name, function in [('concat loop', concat_loop), ('records', records)]:
+        elapsed, peak, rows = measure(function, responses)
+        print(f"{name:<12} {elapsed:8.2f} s {peak:8.1f} MiB peak {rows:>8} rows")
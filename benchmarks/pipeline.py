@@ -0,0 +1,262 @@
+"""
+End-to-end benchmark of the data build pipeline against the local stand-in
+
+Runs DataBaseManager.create() and the images pipeline against fixtures
+synthesized from a data folder, at several history sizes (the last season,
+the last decade, 1950-present). Each sample runs in its own process and
+reports wall time, requests and peak RSS, per stage and in total (stages
+that create() runs concurrently also count each other's requests). Results
+are compared with benchmarks/baselines.json; a regression makes the exit
+status 1.
+
+The stand-in has no rate limit, so the published Jolpica limits are turned
+off unless --throttle is given.
+
+Usage: python benchmarks/pipeline.py [--sizes season decade full] [--cases create images]
+                                     [--repeat 3] [--latency 0] [--save] [data folder]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+SIZES = {'season': 1, 'decade': 10, 'full': None}
+# Como no build real, as temporadas mais recentes vêm da API e o resto do arquivo do Ergast
+API_SEASONS = 5
+CASES = ['create', 'images']
+# Quanto o tempo e a memória podem crescer antes de contar como regressão
+TOLERANCE = 0.25
+
+
+def fixture_folder(data_folder: str, size: str, folder: str) -> tuple[str, int]:
+    # Mesmas entidades, com corridas e classificações limitadas às últimas temporadas.
+    # O create() precisa de ao menos uma temporada no arquivo do Ergast: com uma só temporada
+    # da API, a anterior entra no arquivo
+    os.makedirs(folder, exist_ok=True)
+    races = pd.read_csv(os.path.join(data_folder, 'races.csv'))
+    last = int(races.season.max())
+    first = last - max(SIZES[size], 2) + 1 if SIZES[size] else int(races.season.min())
+    ergast_last_season = max(first, last - min(API_SEASONS, SIZES[size] or API_SEASONS))
+    for name in ['drivers', 'constructors', 'circuits', 'races', 'driver_standings', 'constructor_standings']:
+        df = pd.read_csv(os.path.join(data_folder, f'{name}.csv'))
+        if 'season' in df.columns:
+            df = df[df.season.between(first, last)]
+        df.to_csv(os.path.join(folder, f'{name}.csv'), index=False)
+    return folder, ergast_last_season
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss é em KiB no Linux e em bytes no macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+class Meter:
+
+    def __init__(self, server):
+        self.server = server
+        self.stages = {}
+
+    def requests(self) -> int:
+        return sum(count for key, count in self.server.stats.items() if not key.startswith('error'))
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        start, requests = time.perf_counter(), self.requests()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {'time': 0.0, 'requests': 0})
+            stage['time'] += time.perf_counter() - start
+            stage['requests'] += self.requests() - requests
+
+    def wrap(self, owner, attribute: str, name: str = None):
+        function = getattr(owner, attribute)
+
+        def wrapped(*args, **kwargs):
+            with self.measure(name or attribute):
+                return function(*args, **kwargs)
+        setattr(owner, attribute, wrapped)
+
+
+def run_create(fixtures: str, workdir: str, meter: Meter, throttle: bool):
+    from manager.database import DataBaseManager, Ergast
+
+    # download e leitura dos CSVs do Ergast são medidos separadamente
+    meter.wrap(Ergast, 'download', 'ergast download')
+    meter.wrap(Ergast, 'read_csv', 'ergast parse')
+    database = DataBaseManager(os.path.join(workdir, 'data'), session=meter.server.session())
+    if not throttle:
+        database.jolpica.buckets = []
+    for attribute in ['create_drivers', 'create_constructors', 'create_circuits', 'create_races',
+                      'create_constructor_standings', 'create_driver_standings', 'validate']:
+        meter.wrap(database, attribute, attribute.replace('create_', ''))
+    original_save = database.save
+
+    def save(*args, **kwargs):
+        # save() chama validate(): o tempo do validate é descontado do save
+        validate = meter.stages.get('validate', {}).get('time', 0.0)
+        with meter.measure('save'):
+            original_save(*args, **kwargs)
+        meter.stages['save']['time'] -= meter.stages['validate']['time'] - validate
+    database.save = save
+    database.create(restart=True)
+
+
+def run_images(fixtures: str, workdir: str, meter: Meter, throttle: bool):
+    from manager import images
+    from manager.replay import RouteAdapter, mount
+
+    mount(images.session, RouteAdapter(meter.server.url, pool_maxsize=images.NETWORK_WORKERS))
+    drivers = pd.read_csv(os.path.join(fixtures, 'drivers.csv'))
+    driver_standings = pd.read_csv(os.path.join(fixtures, 'driver_standings.csv'))
+    drivers = drivers[drivers.driverId.isin(driver_standings[driver_standings.season >= images.START_SEASON].driverId)]
+    constructors = pd.read_csv(os.path.join(fixtures, 'constructors.csv'))
+    constructor_standings = pd.read_csv(os.path.join(fixtures, 'constructor_standings.csv'))
+    constructors = constructors[constructors.constructorId.isin(constructor_standings[constructor_standings.season >= images.START_SEASON].constructorId)]
+
+    manifest = images.ImageManifest(os.path.join(workdir, 'manifest.json'))
+    with meter.measure('drivers images'):
+        images.process_images({driver.driverId: images.driver_source(driver.url) for driver in drivers.itertuples()},
+                              os.path.join(workdir, 'drivers'), manifest=manifest)
+    with meter.measure('constructors images'):
+        images.process_images({constructor.constructorId: images.constructor_source(constructor.name) for constructor in constructors.itertuples()},
+                              os.path.join(workdir, 'constructors'), manifest=manifest)
+    # Segunda execução: só requisições condicionais, nada para reprocessar
+    with meter.measure('images refresh'):
+        images.process_images({driver.driverId: images.driver_source(driver.url) for driver in drivers.itertuples()},
+                              os.path.join(workdir, 'drivers'), manifest=manifest)
+
+
+def child(case: str, fixtures: str, ergast_last_season: int, latency: float, throttle: bool):
+    from manager.replay import StandInServer
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            StandInServer(fixtures, latency=latency, ergast_last_season=ergast_last_season) as server:
+        # O zip é montado pelo servidor na primeira requisição: monta antes para não entrar na medida
+        server.data.ergast_archive()
+        meter = Meter(server)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            {'create': run_create, 'images': run_images}[case](fixtures, workdir, meter, throttle)
+        result = {
+            'time': time.perf_counter() - start,
+            'requests': meter.requests(),
+            'rss_mib': peak_rss_mib(),
+            'stages': meter.stages,
+        }
+    print(json.dumps(result))
+
+
+def sample(case: str, fixtures: str, ergast_last_season: int, latency: float, throttle: bool) -> dict:
+    command = [
+        sys.executable, __file__, '--child', case, fixtures,
+        '--ergast-last-season', str(ergast_last_season), '--latency', str(latency),
+    ]
+    if throttle:
+        command.append('--throttle')
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{case} failed on {fixtures}:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list[dict]) -> dict:
+    # Mediana dos tempos; requisições e memória do pior caso
+    stages = {
+        name: {
+            'time': round(statistics.median(s['stages'][name]['time'] for s in samples), 3),
+            'requests': max(s['stages'][name]['requests'] for s in samples),
+        }
+        for name in samples[0]['stages']
+    }
+    return {
+        'time': round(statistics.median(s['time'] for s in samples), 3),
+        'requests': max(s['requests'] for s in samples),
+        'rss_mib': round(max(s['rss_mib'] for s in samples), 1),
+        'stages': stages,
+    }
+
+
+def regressions(result: dict, baseline: dict) -> list[str]:
+    found = []
+    if result['time'] > baseline['time'] * (1 + TOLERANCE):
+        found.append(f"time {baseline['time']:.2f} -> {result['time']:.2f} s")
+    if result['requests'] > baseline['requests']:
+        found.append(f"requests {baseline['requests']} -> {result['requests']}")
+    if result['rss_mib'] > baseline['rss_mib'] * (1 + TOLERANCE):
+        found.append(f"peak RSS {baseline['rss_mib']:.0f} -> {result['rss_mib']:.0f} MiB")
+    return found
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the data build pipeline against the local stand-in')
+    parser.add_argument('data_folder', nargs='?', default='static/data')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the stand-in adds to every response')
+    parser.add_argument('--throttle', action='store_true', help='Keep the Jolpica rate limits')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baselines')
+    parser.add_argument('--child', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--ergast-last-season', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.data_folder, args.ergast_last_season, args.latency, args.throttle)
+        sys.exit(0)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+
+    results = {}
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            fixtures, ergast_last_season = fixture_folder(args.data_folder, size, os.path.join(folder, size))
+            for case in args.cases:
+                name = f'{case}/{size}'
+                result = summarize([
+                    sample(case, fixtures, ergast_last_season, args.latency, args.throttle)
+                    for _ in range(args.repeat)
+                ])
+                results[name] = result
+
+                print(f"{name:<16} {result['time']:8.2f} s {result['requests']:6} requests {result['rss_mib']:8.0f} MiB peak RSS")
+                for stage, values in result['stages'].items():
+                    print(f"    {stage:<28} {values['time']:8.2f} s {values['requests']:6} requests")
+                if name in baselines:
+                    found = regressions(result, baselines[name])
+                    failed |= bool(found)
+                    for regression in found:
+                        print(f"    REGRESSION {regression}")
+
+    if args.save:
+        for result in results.values():
+            result['commit'] = commit()
+        baselines.update(results)
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        print(f"Baselines saved to {BASELINES}")
+    sys.exit(1 if failed and not args.save else 0)
@@ -0,0 +1,77 @@
+"""
+Check that DataBaseManager.validate repairs standings positions exactly like
+the previous groupby().apply implementation, and time both
+
+The shipped standings are already repaired, so each table is also checked
+with a sample of positions blanked out
+
+Usage: python benchmarks/validate.py [data folder]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from manager.database import DataBaseManager
+
+
+def legacy_tratar_posicoes(standings: pd.DataFrame):
+    contains_nan = not all(standings.groupby(['season', 'round']).apply(lambda x: x['position'].nunique() == x.shape[0], include_groups=False))
+    if contains_nan:
+        standings['position'] = pd.to_numeric(standings['position'])
+        standings = standings.groupby(['season', 'round'], group_keys=True).apply(
+            lambda x: x.sort_values('position').assign(position=lambda y: y['position'].ffill() + y['position'].isna().cumsum()) if x['position'].isna().any() else x,
+            include_groups=False
+        ).reset_index().drop(columns='level_2', axis=1)
+    return standings
+
+
+def vectorized_tratar_posicoes(driver_standings: pd.DataFrame, constructor_standings: pd.DataFrame):
+    database = DataBaseManager(tempfile.mkdtemp())
+    database.dados = {
+        'driver_standings': driver_standings,
+        'constructor_standings': constructor_standings,
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.validate()
+    return database.dados['driver_standings'], database.dados['constructor_standings']
+
+
+def blank_positions(standings: pd.DataFrame, seed: int, size: int = 2000) -> pd.DataFrame:
+    standings = standings.copy()
+    rng = np.random.default_rng(seed)
+    standings.loc[rng.choice(len(standings), size, replace=False), 'position'] = np.nan
+    return standings
+
+
+if __name__ == '__main__':
+    data_folder = sys.argv[1] if len(sys.argv) > 1 else 'static/data'
+    driver_standings = pd.read_csv(os.path.join(data_folder, 'driver_standings.csv'))
+    constructor_standings = pd.read_csv(os.path.join(data_folder, 'constructor_standings.csv'))
+
+    cases = {
+        'shipped': (driver_standings, constructor_standings),
+        'blanked': (blank_positions(driver_standings, 1), blank_positions(constructor_standings, 2)),
+        'blanked + shuffled': (
+            blank_positions(driver_standings, 3).sample(frac=1, random_state=3),
+            blank_positions(constructor_standings, 4).sample(frac=1, random_state=4),
+        ),
+    }
+    for case, (drivers, constructors) in cases.items():
+        start = time.perf_counter()
+        expected = legacy_tratar_posicoes(drivers.copy()), legacy_tratar_posicoes(constructors.copy())
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = vectorized_tratar_posicoes(drivers.copy(), constructors.copy())
+        vectorized_elapsed = time.perf_counter() - start
+
+        for name, left, right in zip(['driver_standings', 'constructor_standings'], expected, result):
+            pd.testing.assert_frame_equal(left, right, obj=f'{case} {name}')
+        print(f"{case:<20} legacy {legacy_elapsed:6.2f} s   vectorized {vectorized_elapsed:6.3f} s   identical")
@@ -1,13 +1,37 @@
-import pandas as pd
-import os
-import plotly.express as px
 import os
-import requests
-import zipfile
 import shutil
+import zipfile
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import requests
 
 DIRETORIO_BASE = './data/'
 
+TABELAS = [
+    'drivers',
+    'results',
+    'driver_standings',
+    'constructors',
+    'constructor_results',
+    'constructor_standings',
+    'races',
+    'circuits',
+    'lap_times',
+    'pit_stops',
+    'qualifying',
+    'seasons',
+    'sprint_results',
+    'status',
+]
+# Colunas de texto com até essa fração de valores distintos viram category
+FRACAO_CATEGORIA = 0.5
+# Linhas por bloco na leitura do CSV e em cada record batch do cache
+TAMANHO_BLOCO = 500_000
+
 
 def download_ergast():
     if os.path.exists('data'):
@@ -33,20 +57,94 @@ def download_ergast():
         os.remove('data/f1db_csv.zip')
 
 
-def load_ergast():
-    data = {}
-    data['drivers'] = pd.read_csv(DIRETORIO_BASE + 'drivers.csv')
-    data['results'] = pd.read_csv(DIRETORIO_BASE + 'results.csv')
-    data['driver_standings'] = pd.read_csv(DIRETORIO_BASE + 'driver_standings.csv')
-    data['constructors'] = pd.read_csv(DIRETORIO_BASE + 'constructors.csv')
-    data['constructor_results'] = pd.read_csv(DIRETORIO_BASE + 'constructor_results.csv')
-    data['constructor_standings'] = pd.read_csv(DIRETORIO_BASE + 'constructor_standings.csv')
-    data['races'] = pd.read_csv(DIRETORIO_BASE + 'races.csv')
-    data['circuits'] = pd.read_csv(DIRETORIO_BASE + 'circuits.csv')
-    data['lap_times'] = pd.read_csv(DIRETORIO_BASE + 'lap_times.csv')
-    data['pit_stops'] = pd.read_csv(DIRETORIO_BASE + 'pit_stops.csv')
-    data['qualifying'] = pd.read_csv(DIRETORIO_BASE + 'qualifying.csv')
-    data['seasons'] = pd.read_csv(DIRETORIO_BASE + 'seasons.csv')
-    data['sprint_results'] = pd.read_csv(DIRETORIO_BASE + 'sprint_results.csv')
-    data['status'] = pd.read_csv(DIRETORIO_BASE + 'status.csv')
-    return data
\ No newline at end of file
+def reduzir_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    # Inteiros no menor tipo que comporta os valores (nullable se houver nulos), floats em float32
+    # e textos repetitivos como category
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_bool_dtype(serie) or isinstance(serie.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(serie) or pd.api.types.is_float_dtype(serie):
+            valores = serie.dropna()
+            if not (valores == np.floor(valores)).all():
+                df[coluna] = pd.to_numeric(serie, downcast='float')
+                continue
+            menor, maior = (valores.min(), valores.max()) if len(valores) else (0, 0)
+            tipo = next(t for t in ['int8', 'int16', 'int32', 'int64'] if np.iinfo(t).min <= menor and maior <= np.iinfo(t).max)
+            df[coluna] = serie.astype(tipo if len(valores) == len(serie) else tipo.capitalize())
+        elif serie.dtype == object and serie.nunique() <= FRACAO_CATEGORIA * len(serie):
+            df[coluna] = serie.astype('category')
+    return df
+
+
+def ler_csv(caminho: str) -> pd.DataFrame:
+    # Em blocos, para que a tabela inteira nunca exista com os tipos padrão do pandas; \N é o nulo do Ergast
+    blocos = pd.read_csv(caminho, na_values=['\\N'], chunksize=TAMANHO_BLOCO)
+    return reduzir_tipos(pd.concat([reduzir_tipos(bloco) for bloco in blocos], ignore_index=True))
+
+
+class ErgastDataset(Mapping):
+    # Tabelas do Ergast carregadas no primeiro acesso, com tipos reduzidos. Cada tabela lida do CSV é
+    # guardada em <diretorio>/.cache como Feather sem compressão e, enquanto o CSV não mudar,
+    # as próximas sessões leem essa cópia com memory map
+
+    def __init__(self, diretorio: str = DIRETORIO_BASE, cache: str = None):
+        self.diretorio = diretorio
+        self.cache = cache if cache is not None else os.path.join(diretorio, '.cache')
+        self.tabelas = {}
+
+    def __caminhos(self, nome: str) -> tuple[str, str]:
+        return os.path.join(self.diretorio, f'{nome}.csv'), os.path.join(self.cache, f'{nome}.feather')
+
+    def __cache_valido(self, nome: str) -> bool:
+        csv, arquivo = self.__caminhos(nome)
+        return os.path.exists(arquivo) and (not os.path.exists(csv) or os.path.getmtime(arquivo) >= os.path.getmtime(csv))
+
+    def __getitem__(self, nome: str) -> pd.DataFrame:
+        if nome not in self.tabelas:
+            self.tabelas[nome] = self.ler(nome)
+        return self.tabelas[nome]
+
+    def __iter__(self):
+        return iter(nome for nome in TABELAS if os.path.exists(self.__caminhos(nome)[0]) or self.__cache_valido(nome))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def ler(self, nome: str, colunas: list[str] = None) -> pd.DataFrame:
+        if nome not in TABELAS:
+            raise KeyError(nome)
+        csv, arquivo = self.__caminhos(nome)
+        if not self.__cache_valido(nome):
+            if not os.path.exists(csv):
+                raise KeyError(nome)
+            df = ler_csv(csv)
+            os.makedirs(self.cache, exist_ok=True)
+            feather.write_feather(df, arquivo + '.tmp', compression='uncompressed', chunksize=TAMANHO_BLOCO)
+            os.replace(arquivo + '.tmp', arquivo)
+            return df[colunas] if colunas is not None else df
+        return feather.read_table(arquivo, columns=colunas, memory_map=True).to_pandas()
+
+    def blocos(self, nome: str, colunas: list[str] = None, tamanho: int = TAMANHO_BLOCO):
+        # Itera a tabela em DataFrames de até `tamanho` linhas, sem carregá-la inteira
+        csv, arquivo = self.__caminhos(nome)
+        if self.__cache_valido(nome):
+            with pa.memory_map(arquivo) as fonte:
+                leitor = pa.ipc.open_file(fonte)
+                for i in range(leitor.num_record_batches):
+                    lote = leitor.get_batch(i)
+                    if colunas is not None:
+                        lote = lote.select(colunas)
+                    for inicio in range(0, lote.num_rows, tamanho):
+                        yield lote.slice(inicio, tamanho).to_pandas()
+            return
+        for bloco in pd.read_csv(csv, na_values=['\\N'], usecols=colunas, chunksize=tamanho):
+            yield reduzir_tipos(bloco)
+
+    def lap_times(self, colunas: list[str] = None, tamanho: int = TAMANHO_BLOCO):
+        return self.blocos('lap_times', colunas, tamanho)
+
+
+def load_ergast() -> ErgastDataset:
+    # Continua se comportando como o dicionário de antes, mas cada tabela só é lida quando acessada
+    return ErgastDataset(DIRETORIO_BASE)
@@ -0,0 +1,44 @@
+"""
+Database build and image refresh in one process
+
+Runs DataBaseManager.create()/update() and then refreshes the driver and
+constructor images from the tables still in memory, instead of a second
+process reading back the CSVs the first one has just written. The images
+module (and PIL/BeautifulSoup with it) is only imported when that stage
+starts.
+
+Usage: python -m manager.build <create|update> <data folder> <images folder> [database options] [--skip-images]
+"""
+import argparse
+
+from manager.database import add_arguments, run
+from manager.instrumentation import Instrumentation, report
+
+
+def refresh_images(database, images_folder: str, instrumentation: Instrumentation):
+    from manager import images
+
+    if database.session is not None:
+        # Gravação/replay (--record/--replay) valem também para as páginas e imagens
+        for prefix, adapter in database.session.adapters.items():
+            images.session.mount(prefix, adapter)
+    with instrumentation.stage('images'):
+        images.update_images(database.directory, images_folder, dados=database.dados, instrumentation=instrumentation)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m manager.build', description='Build the F1 database and refresh the images in one process')
+    add_arguments(parser)
+    parser.add_argument('images_folder')
+    parser.add_argument('--skip-images', action='store_true', help='Only build the database')
+    args = parser.parse_args()
+
+    instrumentation = Instrumentation(quiet=args.quiet, reports=[report(path) for path in args.report])
+    status = 'error'
+    try:
+        database = run(args, instrumentation)
+        if not args.skip_images:
+            refresh_images(database, args.images_folder, instrumentation)
+        status = 'ok'
+    finally:
+        instrumentation.close(f'build {args.command}', status)
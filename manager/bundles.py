@@ -0,0 +1,127 @@
+"""
+Per-season JSON bundles for the front end
+
+Each bundle carries one season's races, the drivers and constructors that
+scored in it and both standings tables, already joined with the entity
+names, so the app can fetch only the season being viewed. It also carries
+the per-round snapshots the chart shows when the round slider moves,
+keyed by mode, round and entity name.
+"""
+import json
+import os
+
+import pandas as pd
+
+from manager.files import write_json
+
+FIRST_SEASON = 2000
+FOLDER = 'seasons'
+
+
+def records(df: pd.DataFrame) -> list[dict]:
+    return json.loads(df.to_json(orient='records'))
+
+
+def snapshots(standings: pd.DataFrame, mode: str, entities: pd.DataFrame, columns: list[str]) -> dict[int, dict]:
+    # temporada -> rodada -> nome -> entidade, no formato de getEntities (src/lib/standingsUtils.js): a primeira
+    # linha de cada entidade na rodada, com as entidades na ordem em que aparecem pela primeira vez na temporada.
+    # A ordem é a das linhas recebidas (a do CSV que o app lê) e define as cores e a legenda: nada é reordenado
+    entity_id = f'{mode}Id'
+    standings = standings.dropna(subset=[mode])
+    first = standings.drop_duplicates(['season', mode])
+    first = first[['season', mode]].assign(order=first.groupby('season').cumcount())
+    table = (
+        standings.drop_duplicates(['season', 'round', mode])
+        .merge(first, on=['season', mode])
+        .sort_values(['season', 'round', 'order'], kind='stable')
+        .join(entities.set_index(entity_id)[[column for column in ['url'] + columns if column not in standings]], on=entity_id)
+        .rename(columns={mode: 'name', entity_id: 'id'})
+    )
+    index = {}
+    for entity in records(table[['name', 'points', 'position', 'round', 'season', 'wins', 'id', 'url'] + columns]):
+        index.setdefault(entity['season'], {}).setdefault(entity['round'], {})[entity['name']] = entity
+    return index
+
+
+def season_snapshots(dados: dict[str, pd.DataFrame], seasons: list[int]) -> dict[int, dict]:
+    # temporada -> modo -> rodada -> nome -> entidade, de todas as temporadas de uma vez
+    drivers = dados['drivers']
+    constructors = dados['constructors']
+    driver_standings = dados['driver_standings'][dados['driver_standings'].season.isin(seasons)]
+    constructor_standings = dados['constructor_standings'][dados['constructor_standings'].season.isin(seasons)]
+
+    driver_names = (drivers.givenName + ' ' + drivers.familyName).set_axis(drivers.driverId)
+    constructor_names = constructors.set_index('constructorId')['name']
+
+    driver = snapshots(
+        driver_standings.assign(
+            driver=driver_standings.driverId.map(driver_names),
+            constructor=driver_standings.constructorId.map(constructor_names),
+        ),
+        'driver', drivers, ['dateOfBirth', 'nationality', 'constructor'],
+    )
+    constructor = snapshots(
+        constructor_standings.assign(constructor=constructor_standings.constructorId.map(constructor_names)),
+        'constructor', constructors, ['nationality'],
+    )
+    return {season: {'driver': driver.get(season, {}), 'constructor': constructor.get(season, {})} for season in seasons}
+
+
+def season_bundle(dados: dict[str, pd.DataFrame], season: int, snapshot: dict = None) -> dict:
+    drivers = dados['drivers']
+    constructors = dados['constructors']
+    races = dados['races'][dados['races'].season == season]
+    driver_standings = dados['driver_standings'][dados['driver_standings'].season == season]
+    constructor_standings = dados['constructor_standings'][dados['constructor_standings'].season == season]
+
+    drivers = drivers[drivers.driverId.isin(driver_standings.driverId)]
+    constructors = constructors[
+        constructors.constructorId.isin(constructor_standings.constructorId)
+        | constructors.constructorId.isin(driver_standings.constructorId)
+    ]
+
+    driver_names = (drivers.givenName + ' ' + drivers.familyName).set_axis(drivers.driverId)
+    constructor_names = constructors.set_index('constructorId')['name']
+
+    # Standings na ordem do CSV, a mesma que standingsBySeason devolve quando o app lê os CSVs
+    driver_standings = (
+        driver_standings[['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'wins']]
+        .assign(driver=driver_standings.driverId.map(driver_names))
+    )
+    constructor_standings = (
+        constructor_standings[['season', 'round', 'constructorId', 'points', 'position', 'wins']]
+        .assign(constructor=constructor_standings.constructorId.map(constructor_names))
+    )
+
+    return {
+        'season': season,
+        'races': records(races[['season', 'round', 'circuitId', 'raceName', 'date', 'url']]),
+        'drivers': records(drivers[['driverId', 'code', 'givenName', 'familyName', 'dateOfBirth', 'nationality', 'url']]),
+        'constructors': records(constructors[['constructorId', 'name', 'nationality', 'url']]),
+        'driverStandings': records(driver_standings),
+        'constructorStandings': records(constructor_standings),
+        'snapshots': snapshot if snapshot is not None else season_snapshots(dados, [season])[season],
+    }
+
+
+def write_season_bundles(dados: dict[str, pd.DataFrame], directory: str, first_season: int = FIRST_SEASON) -> list[int]:
+    folder = os.path.join(directory, FOLDER)
+    os.makedirs(folder, exist_ok=True)
+
+    seasons = sorted(int(season) for season in dados['driver_standings'].season.unique() if season >= first_season)
+    manifest = {'seasons': []}
+    written = []
+    snapshot = season_snapshots(dados, seasons)
+    for season in seasons:
+        bundle = season_bundle(dados, season, snapshot[season])
+        file = f'{FOLDER}/{season}.json'
+        if write_json(os.path.join(directory, file), bundle):
+            written.append(season)
+        manifest['seasons'].append({
+            'season': season,
+            'file': file,
+            'rounds': sorted(set(race['round'] for race in bundle['races'])),
+            'lastRound': max((standing['round'] for standing in bundle['driverStandings']), default=None),
+        })
+    write_json(os.path.join(folder, 'manifest.json'), manifest)
+    return written
@@ -1,32 +1,261 @@
+import argparse
 import datetime
+import email.utils
+import hashlib
+import json
 import os
+import random
 import shutil
-import sys
+import sqlite3
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import requests
-from tqdm import tqdm
+from requests.adapters import HTTPAdapter
+
+from manager.bundles import write_season_bundles
+from manager.files import read_json, replacing, write_json
+from manager.instrumentation import Instrumentation, count_rows, report
+from manager.matcher import Matcher
+from manager.publish import TABLE_KEYS, load_release, publish, table_delta
+from manager.scheduler import Scheduler
+from manager.standings import SPOT_CHECKS, StandingsEngine, disagreements
+from manager.storage import STORAGES, apply_schema
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+
+    # Temporadas encerradas nunca mudam; a temporada atual (e as listagens gerais) expiram rápido
+    CURRENT_SEASON_TTL = 6 * 3600
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, body TEXT NOT NULL, created REAL NOT NULL, expires REAL)'
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def key(endpoint: str, season: int = None, round: int = None, limit: int = None, offset: int = None) -> str:
+        return f"{endpoint.strip('/')}|{season}|{round}|{limit}|{offset}"
+
+    def ttl(self, season: int = None) -> float | None:
+        if season and int(season) < datetime.date.today().year:
+            return None
+        return self.CURRENT_SEASON_TTL
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            row = self.connection.execute('SELECT body, expires FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, data: dict, season: int = None):
+        now = time.time()
+        ttl = self.ttl(season)
+        expires = None if ttl is None else now + ttl
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses (key, body, created, expires) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(data), now, expires),
+            )
+            self.connection.commit()
+
+    def prune(self, everything: bool = False) -> int:
+        with self.lock:
+            if everything:
+                cursor = self.connection.execute('DELETE FROM responses')
+            else:
+                cursor = self.connection.execute('DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?', (time.time(),))
+            self.connection.commit()
+            self.connection.execute('VACUUM')
+        return cursor.rowcount
 
 
 class Jolpica:
 
     BASE_URL = 'https://api.jolpi.ca/ergast/f1'
 
-    def __requests_get(self, endpoint, season: int = None, round: int = None, limit: int = 100, offset: int = None) -> dict:
-        url = f"{self.BASE_URL}"
+    # Limites publicados pela API: 4 req/s em rajada e 500 req/h sustentado
+    BURST_LIMIT = (4, 4)
+    SUSTAINED_LIMIT = (500 / 3600, 500)
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    MAX_RETRIES = 6
+    BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+    # Maior página aceita pela API; se o servidor limitar a menos, o passo segue o limit da resposta
+    MAX_PAGE_SIZE = 100
+    # Novas varreduras, sem cache, quando o total muda no meio da paginação
+    MAX_RESCANS = 2
+    # Endpoint, tabela e lista de linhas de cada listagem paginada
+    LISTS = {
+        'drivers': ('/drivers.json', 'DriverTable', 'Drivers'),
+        'constructors': ('/constructors.json', 'ConstructorTable', 'Constructors'),
+        'circuits': ('/circuits.json', 'CircuitTable', 'Circuits'),
+        'races': ('/races.json', 'RaceTable', 'Races'),
+    }
+
+    def __init__(self, pool_size: int = 10, cache: ResponseCache = None, base_url: str = None, session: requests.Session = None,
+                 instrumentation: Instrumentation = None):
+        self.cache = cache
+        self.instrumentation = instrumentation or Instrumentation()
+        self.base_url = base_url or self.BASE_URL
+        # Uma session externa (gravação, replay, servidor local) é usada como veio
+        self.session = session
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        self.buckets = [
+            TokenBucket(*self.BURST_LIMIT),
+            TokenBucket(*self.SUSTAINED_LIMIT),
+        ]
+
+    def __throttle(self):
+        for bucket in self.buckets:
+            bucket.acquire()
+
+    def __retry_delay(self, attempt: int, response: requests.Response = None) -> float:
+        if response is not None and response.headers.get('Retry-After'):
+            retry_after = response.headers['Retry-After']
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = email.utils.parsedate_to_datetime(retry_after)
+                    delay = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = 0
+            return max(delay, 0) + random.uniform(0, self.BACKOFF)
+        return random.uniform(0, min(self.MAX_BACKOFF, self.BACKOFF * 2 ** attempt))
+
+    def __requests_get(self, endpoint, season: int = None, round: int = None, limit: int = 100, offset: int = None,
+                       refresh: bool = False) -> dict:
+        url = f"{self.base_url}"
         if season:
             url += f"/{season}"
             if round:
                 url += f"/{round}"
         
         url += f"/{endpoint}"
+        name = endpoint.strip('/').removesuffix('.json')
         params = {
             'limit': limit,
             'offset': offset
         }
-        response = requests.get(url, params=params)
-        return response.json()
+        if self.cache is not None:
+            key = ResponseCache.key(endpoint, season, round, limit, offset)
+            if self.base_url != self.BASE_URL:
+                # Respostas de outra origem (servidor local) não se misturam com as da API
+                key = f"{self.base_url}|{key}"
+            # refresh ignora a resposta guardada, mas guarda a nova
+            cached = None if refresh else self.cache.get(key)
+            if cached is not None:
+                self.instrumentation.request(name, season=season, round=round, offset=offset, cache='hit')
+                return cached
+
+        # Tempo de espera pelo limite de taxa e de rede, bytes e tentativas entram no evento da requisição
+        throttle_seconds = seconds = 0.0
+        transferred = 0
+        response = None
+        try:
+            for attempt in range(self.MAX_RETRIES + 1):
+                start = time.perf_counter()
+                self.__throttle()
+                throttle_seconds += time.perf_counter() - start
+                response = None
+                start = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=30)
+                    transferred += len(response.content)
+                    if response.status_code not in self.RETRY_STATUS:
+                        response.raise_for_status()
+                        data = response.json()
+                        if self.cache is not None:
+                            self.cache.set(key, data, season)
+                        return data
+                except (requests.ConnectionError, requests.Timeout):
+                    pass
+                finally:
+                    seconds += time.perf_counter() - start
+                if attempt == self.MAX_RETRIES:
+                    break
+                time.sleep(self.__retry_delay(attempt, response))
+            if response is not None:
+                response.raise_for_status()
+            raise requests.ConnectionError(f"Failed to fetch {url} after {self.MAX_RETRIES} retries")
+        finally:
+            self.instrumentation.request(
+                name, season=season, round=round, offset=offset,
+                status=response.status_code if response is not None else None,
+                bytes=transferred, seconds=seconds, throttle_seconds=throttle_seconds, retries=attempt,
+                cache='off' if self.cache is None else 'miss',
+            )
+
+    def fetch_many(self, method, calls: list[dict], workers: int = 1, desc: str = None) -> list[dict]:
+        # Resultados sempre na mesma ordem de `calls`, independente do número de workers
+        if workers <= 1:
+            return [method(**kwargs) for kwargs in self.instrumentation.progress(calls, desc=desc)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(self.instrumentation.progress(executor.map(lambda kwargs: method(**kwargs), calls), total=len(calls), desc=desc))
+
+    def paginate(self, name: str, season: int = None, round: int = None, workers: int = 1):
+        # A primeira página revela o total e o tamanho de página do servidor; as demais são buscadas em paralelo.
+        # As linhas saem em ordem, página a página, depois que todas as páginas concordam no total
+        endpoint, table, rows = self.LISTS[name]
+        for scan in range(self.MAX_RESCANS + 1):
+            refresh = scan > 0
+            first = self.__requests_get(endpoint, season, round, self.MAX_PAGE_SIZE, 0, refresh=refresh)
+            total = int(first['MRData']['total'])
+            step = max(int(first['MRData'].get('limit') or self.MAX_PAGE_SIZE), 1)
+            pages = [first] + self.fetch_many(
+                lambda offset: self.__requests_get(endpoint, season, round, step, offset, refresh=refresh),
+                [{'offset': offset} for offset in range(step, total, step)],
+                workers=workers,
+            )
+            totals = set(int(page['MRData']['total']) for page in pages)
+            if totals == {total} and sum(len(page['MRData'][table][rows]) for page in pages) == total:
+                for page in pages:
+                    yield from page['MRData'][table][rows]
+                return
+            self.instrumentation.log(f"{name}: total changed during pagination {sorted(totals)}, scanning again...")
+        raise IOError(f"Total of {name} kept changing during pagination")
+
+    def paginate_seasons(self, name: str, seasons: list[int], workers: int = 1) -> list[dict]:
+        # Uma paginação por temporada, em paralelo entre temporadas; linhas na ordem das temporadas
+        pages = self.fetch_many(lambda season: list(self.paginate(name, season)), [{'season': season} for season in seasons], workers=workers)
+        return [row for rows in pages for row in rows]
 
     def constructor_standing(self, season: int = None, round: int = None, limit: int = 100, offset: int = None) -> dict:
         return self.__requests_get('/constructorstandings.json', season, round, limit, offset)
@@ -49,50 +278,171 @@ class Jolpica:
     def circuits(self, season: int = None, round: int = None, limit: int = 100, offset: int = None) -> dict:
         return self.__requests_get('/circuits.json', season, round, limit, offset)
 
+    def results(self, season: int = None, round: int = None, limit: int = 100, offset: int = None) -> dict:
+        return self.__requests_get('/results.json', season, round, limit, offset)
+
+    def sprint(self, season: int = None, round: int = None, limit: int = 100, offset: int = None) -> dict:
+        return self.__requests_get('/sprint.json', season, round, limit, offset)
+
 
 class Ergast:
 
+    URL = 'https://ergast.com/downloads/f1db_csv.zip'
+    ARCHIVE = 'f1db_csv.zip'
+    CHUNK_SIZE = 2 ** 20
+    # Só essas tabelas são usadas pelo create(); lap_times.csv sozinho tem centenas de MB
+    MEMBERS = ['drivers', 'driver_standings', 'constructors', 'constructor_standings', 'races', 'circuits']
+
     @staticmethod
-    def download(folder: str):
-        if os.path.exists(folder):
-            print("Data already downloaded.")
-            return
+    def sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(Ergast.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def verify(archive: str, sha256: str = None) -> bool:
+        # Confere o hash esperado (--ergast-sha256), quando informado, e a estrutura do zip
+        if sha256 is not None and Ergast.sha256(archive) != sha256.lower():
+            return False
+        return zipfile.is_zipfile(archive)
+
+    @staticmethod
+    def fetch(url: str, archive: str, session: requests.Session = None, instrumentation: Instrumentation = None):
+        instrumentation = instrumentation or Instrumentation()
+        start = time.perf_counter()
+        # Baixa em blocos para um .part, retomando com Range se um download anterior foi interrompido
+        partial = archive + '.part'
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        with (session or requests).get(url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code == 416:
+                # O .part já está completo
+                os.replace(partial, archive)
+                instrumentation.request('ergast', status=416, seconds=time.perf_counter() - start)
+                return
+            response.raise_for_status()
+            if response.status_code != 206:
+                # O servidor ignorou o Range: recomeça do zero
+                offset = 0
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            total = int(total) if total.isdigit() else offset + int(response.headers.get('Content-Length', 0)) or None
+
+            transferred = 0
+            with open(partial, 'ab' if offset else 'wb') as file, \
+                    instrumentation.progress(total=total, initial=offset, unit='B', unit_scale=True, desc='f1db_csv.zip') as progress:
+                for chunk in response.iter_content(chunk_size=Ergast.CHUNK_SIZE):
+                    file.write(chunk)
+                    progress.update(len(chunk))
+                    transferred += len(chunk)
+            instrumentation.request('ergast', status=response.status_code, bytes=transferred, seconds=time.perf_counter() - start)
+
+        if total is not None and os.path.getsize(partial) != total:
+            raise IOError(f"Incomplete download of {url}: {os.path.getsize(partial)} of {total} bytes")
+        os.replace(partial, archive)
 
+    @staticmethod
+    def download(folder: str, sha256: str = None, members: list[str] = None, url: str = None, session: requests.Session = None,
+                 instrumentation: Instrumentation = None):
+        instrumentation = instrumentation or Instrumentation()
         os.makedirs(folder, exist_ok=True)
-        url = 'https://ergast.com/downloads/f1db_csv.zip'
+        url = url or Ergast.URL
+        archive = os.path.join(folder, Ergast.ARCHIVE)
+        members = Ergast.MEMBERS if members is None else members
 
-        print(f"Downloading {url}...")
-        response = requests.get(url)
-        with open(os.path.join(folder, 'f1db_csv.zip'), 'wb') as file:
-            file.write(response.content)
+        if all(os.path.exists(os.path.join(folder, f'{member}.csv')) for member in members):
+            instrumentation.log("Data already downloaded.")
+            return
 
-        print("Unzipping the file...")
-        with zipfile.ZipFile(os.path.join(folder, 'f1db_csv.zip')) as f_in:
-            for file in f_in.namelist():
-                with open(os.path.join(folder, file), 'wb') as f_out:
-                    shutil.copyfileobj(f_in.open(file), f_out)
+        if os.path.exists(archive) and not Ergast.verify(archive, sha256):
+            instrumentation.log("Archive failed verification, downloading again...")
+            os.remove(archive)
 
-        print("Cleaning up...")
-        if os.path.exists(os.path.join(folder, 'f1db_csv.zip')):
-            os.remove(os.path.join(folder, 'f1db_csv.zip'))
+        if os.path.exists(archive):
+            instrumentation.log("Data already downloaded.")
+        else:
+            instrumentation.log(f"Downloading {url}...")
+            Ergast.fetch(url, archive, session, instrumentation)
+            if not Ergast.verify(archive, sha256):
+                os.remove(archive)
+                raise IOError(f"Checksum verification failed for {url}" if sha256 else f"{url} is not a zip archive")
+        # Nada é extraído: as tabelas são lidas direto do zip por read_csv
 
+    @staticmethod
+    def read_csv(folder: str, member: str, **kwargs) -> pd.DataFrame:
+        # Usa o CSV extraído se existir (pastas antigas), senão lê do zip sem descompactar em disco
+        path = os.path.join(folder, f'{member}.csv')
+        if os.path.exists(path):
+            return pd.read_csv(path, **kwargs)
+        with zipfile.ZipFile(os.path.join(folder, Ergast.ARCHIVE)) as archive:
+            with archive.open(f'{member}.csv') as file:
+                return pd.read_csv(file, **kwargs)
 
-class Utils:
+
+class Checkpoints:
+
+    def __init__(self, folder: str):
+        self.folder = folder
 
     @staticmethod
-    def delete_folder(folder: str):
-        if os.path.exists(folder):
-            print(f"Deleting folder {folder}...")
-            shutil.rmtree(folder)
-        else:
-            print(f"Folder {folder} does not exist.")
+    def fingerprint(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+    def __paths(self, name: str) -> tuple[str, str]:
+        return os.path.join(self.folder, f'{name}.pkl'), os.path.join(self.folder, f'{name}.json')
+
+    def load(self, name: str, fingerprint: str):
+        artifact, meta = self.__paths(name)
+        if not (os.path.exists(artifact) and os.path.exists(meta)):
+            return None
+        if read_json(meta).get('fingerprint') != fingerprint:
+            return None
+        return pd.read_pickle(artifact)
+
+    def save(self, name: str, fingerprint: str, result):
+        os.makedirs(self.folder, exist_ok=True)
+        artifact, meta = self.__paths(name)
+        with replacing(artifact) as temporary:
+            pd.to_pickle(result, temporary)
+        write_json(meta, {'fingerprint': fingerprint, 'created': datetime.datetime.now().isoformat()})
+
+    def clear(self):
+        if os.path.exists(self.folder):
+            shutil.rmtree(self.folder)
+
 
 class DataBaseManager:
 
-    def __init__(self, directory: str):
+    # Incrementar quando a lógica de alguma etapa mudar, invalidando checkpoints antigos
+    CHECKPOINT_VERSION = 4
+
+    RACES_COLUMNS = ['season', 'round', 'circuitId', 'raceName', 'date', 'url']
+    RACES_DTYPES = {'season': 'int64', 'round': 'int64'}
+    CONSTRUCTOR_STANDINGS_COLUMNS = ['season', 'round', 'constructorId', 'points', 'position', 'wins']
+    DRIVER_STANDINGS_COLUMNS = ['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'wins']
+    STANDINGS_DTYPES = {'season': 'int64', 'round': 'int64', 'points': 'float64', 'position': 'Int64', 'wins': 'int64'}
+
+    def __init__(self, directory: str, workers: int = 1, cache: ResponseCache = None, storages: list[str] = None,
+                 session: requests.Session = None, jolpica_url: str = None, ergast_url: str = None,
+                 ergast_sha256: str = None, instrumentation: Instrumentation = None):
         self.directory = directory
+        self.instrumentation = instrumentation or Instrumentation()
+        self.log = self.instrumentation.log
+        # O primeiro formato é o usado por load(); save() escreve em todos
+        self.storages = [STORAGES[storage](directory) for storage in storages or ['csv']]
+        self.storage = self.storages[0]
         self.ergast_folder = os.path.join(directory, 'ergast')
-        self.jolpica = Jolpica()
+        self.workers = workers
+        self.session = session
+        self.ergast_url = ergast_url
+        self.ergast_sha256 = ergast_sha256
+        self.jolpica = Jolpica(pool_size=max(10, workers), cache=cache, base_url=jolpica_url, session=session,
+                              instrumentation=self.instrumentation)
+        self.standings = StandingsEngine(self.jolpica, workers=workers)
+        self.checkpoints = Checkpoints(os.path.join(directory, '.checkpoints'))
+        self.fingerprints = {}
         self.dados = {}
         self.ergast_folder = os.path.join(self.directory, 'ergast')
         self.df_names = [
@@ -104,360 +454,643 @@ class DataBaseManager:
             'driver_standings',
         ]
     
-    def create(self):
-        print('Creating database...')
+    def create(self, restart: bool = False):
+        self.log('Creating database...')
 
-        if os.path.exists(self.directory):
-            print(f"Directory {self.directory} already exists.")
-            Utils.delete_folder(self.directory)
-        
         os.makedirs(self.directory, exist_ok=True)
-        print(f"Directory {self.directory} created.")
-
-        print("Downloading Ergast data...")
-        Ergast.download(self.ergast_folder)
-        print("Ergast data downloaded.")
+        if restart:
+            self.checkpoints.clear()
+        self.fingerprints = {}
+
+        # Cada etapa recebe os resultados das etapas de que depende; as independentes rodam ao mesmo tempo
+        scheduler = Scheduler()
+        scheduler.add('ergast', self.load_ergast)
+        scheduler.add('drivers', self.create_drivers, 'ergast')
+        scheduler.add('constructors', self.create_constructors, 'ergast')
+        scheduler.add('circuits', self.create_circuits, 'ergast')
+        scheduler.add('races', self.create_races, 'ergast', 'circuits')
+        scheduler.add('constructor_standings', self.create_constructor_standings, 'ergast', 'races', 'constructors')
+        scheduler.add('driver_standings', self.create_driver_standings, 'ergast', 'races', 'drivers', 'constructor_standings')
+
+        self.log("Creating tables...")
+        results = scheduler.run(self.stage)
+        self.dados = {df_name: results[df_name] for df_name in self.df_names}
+
+        path, seconds = scheduler.critical_path()
+        self.log(f"Critical path: {' -> '.join(path)} ({seconds:.1f} s of {scheduler.elapsed:.1f} s)")
+        self.instrumentation.emit('critical_path', stages=path, seconds=seconds, elapsed=scheduler.elapsed)
 
-        print("Loading Ergast data...")
-        drivers = pd.read_csv(self.ergast_folder + '/drivers.csv')
-        driver_standings = pd.read_csv(self.ergast_folder + '/driver_standings.csv')
-        constructors = pd.read_csv(self.ergast_folder + '/constructors.csv')
-        constructor_standings = pd.read_csv(self.ergast_folder + '/constructor_standings.csv')
-        races = pd.read_csv(self.ergast_folder + '/races.csv')
-        circuits = pd.read_csv(self.ergast_folder + '/circuits.csv')
-        print("Ergast data loaded.")
+        self.save()
+        self.checkpoints.clear()
+
+    def stage(self, name: str, build, *inputs: str):
+        # O fingerprint encadeia o das etapas de entrada: se uma etapa muda, todas as seguintes são refeitas
+        fingerprint = Checkpoints.fingerprint(
+            name,
+            self.CHECKPOINT_VERSION,
+            datetime.date.today().isoformat(),
+            *[self.fingerprints[input] for input in inputs],
+        )
+        self.fingerprints[name] = fingerprint
+        self.log(f"\t{name}...")
+        with self.instrumentation.stage(name) as info:
+            result = self.checkpoints.load(name, fingerprint)
+            if result is not None:
+                self.log(f"\t{name} loaded from checkpoint.")
+                info['checkpoint'] = True
+            else:
+                result = build()
+                self.checkpoints.save(name, fingerprint, result)
+            info['rows'] = count_rows(result)
+        return result
+
+    def load_ergast(self) -> dict[str, pd.DataFrame]:
+        self.log("Downloading Ergast data...")
+        Ergast.download(self.ergast_folder, sha256=self.ergast_sha256, url=self.ergast_url, session=self.session,
+                        instrumentation=self.instrumentation)
+        self.log("Ergast data downloaded.")
+
+        self.log("Loading Ergast data...")
+        ergast = {member: Ergast.read_csv(self.ergast_folder, member) for member in Ergast.MEMBERS}
+        self.log("Ergast data loaded.")
 
         self.clean()
-        print("Database created.")
-        
-        print("Creating tables...")
-        print("\tDrivers...")
-        def create_drivers():
-            drivers_old_map_columns = {
-                'driverId': 'driverIdErgast',
-                'code': 'code',
-                'forename': 'givenName',
-                'surname': 'familyName',
-                'dob': 'dateOfBirth',
-                'nationality': 'nationality',
-                'url': 'url',
-            }
+        return ergast
+
+    def create_drivers(self, ergast: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        drivers_old_map_columns = {
+            'driverId': 'driverIdErgast',
+            'code': 'code',
+            'forename': 'givenName',
+            'surname': 'familyName',
+            'dob': 'dateOfBirth',
+            'nationality': 'nationality',
+            'url': 'url',
+        }
 
-            e_drivers = drivers[list(drivers_old_map_columns.keys())].rename(columns=drivers_old_map_columns)
+        e_drivers = ergast['drivers'][list(drivers_old_map_columns.keys())].rename(columns=drivers_old_map_columns)
 
-            j_drivers = pd.DataFrame()
-            offset = 0
-            total = 1
-            while j_drivers.shape[0] < total:
-                print(f"Drivers: {j_drivers.shape[0]} / {total}")
-                temp = self.jolpica.drivers(offset=offset)
-                j_drivers = pd.concat([j_drivers, pd.DataFrame(temp['MRData']['DriverTable']['Drivers'])], ignore_index=True)
-                total = int(temp['MRData']['total'])
-                offset += 100
+        records = list(self.jolpica.paginate('drivers', workers=self.workers))
+        j_drivers = pd.DataFrame(records, columns=['driverId', 'code', 'givenName', 'familyName', 'dateOfBirth', 'nationality', 'url'])
 
-            j_drivers = j_drivers[['driverId', 'code', 'givenName', 'familyName', 'dateOfBirth', 'nationality', 'url']]
+        e_drivers['name'] = e_drivers['givenName'] + ' ' + e_drivers['familyName']
+        j_drivers['name'] = j_drivers['givenName'] + ' ' + j_drivers['familyName']
 
-            e_drivers['name'] = e_drivers['givenName'] + ' ' + e_drivers['familyName']
-            j_drivers['name'] = j_drivers['givenName'] + ' ' + j_drivers['familyName']
+        c_drivers = Matcher('drivers', log=self.log).match(
+            e_drivers[['driverIdErgast', 'name', 'dateOfBirth']],
+            j_drivers,
+            'driverIdErgast', 'driverId',
+            name='name',
+            block='dateOfBirth',
+        )
+        return c_drivers[['driverIdErgast', 'driverId', 'code', 'givenName', 'familyName', 'dateOfBirth', 'nationality', 'url']]
 
-            c_drivers = pd.merge(
-                e_drivers[['driverIdErgast', 'name']],
-                j_drivers,
-                how='outer',
-                on='name',
-            )
-            c_drivers = c_drivers.drop(columns=['name'])
-            return c_drivers
-        c_drivers = create_drivers()
-        
-        print("\tConstructors...")
-        def create_constructors():
-            constructors_old_map_columns = {
-                'constructorId': 'constructorIdErgast',
-                'name': 'name',
-            }
+    def create_constructors(self, ergast: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        constructors_old_map_columns = {
+            'constructorId': 'constructorIdErgast',
+            'name': 'name',
+            'nationality': 'nationality',
+        }
 
-            e_constructors = constructors[list(constructors_old_map_columns.keys())].rename(columns=constructors_old_map_columns)
-
-            j_constructors = pd.DataFrame()
-            offset = 0
-            total = 1
-            while j_constructors.shape[0] < total:
-                print(f"constructors: {j_constructors.shape[0]} / {total}")
-                temp = self.jolpica.constructors(offset=offset)
-                j_constructors = pd.concat([j_constructors, pd.DataFrame(temp['MRData']['ConstructorTable']['Constructors'])], ignore_index=True)
-                total = int(temp['MRData']['total'])
-                offset += 100
-
-            c_constructors = pd.merge(e_constructors, j_constructors, how='outer', on='name')
-            return c_constructors
-        c_constructors = create_constructors()
-        
-        print("\tCircuits...")
-        def create_circuits():
-            circutis_old_map_columns = {
-                'circuitId': 'circuitIdErgast',
-                'name': 'circuitName',
-                'location': 'locality',
-                'country': 'country',
-                'lat': 'lat',
-                'lng': 'long',
-                'url': 'url',
-            }
+        e_constructors = ergast['constructors'][list(constructors_old_map_columns.keys())].rename(columns=constructors_old_map_columns)
+
+        records = list(self.jolpica.paginate('constructors', workers=self.workers))
+        j_constructors = pd.DataFrame(records, columns=['constructorId', 'url', 'name', 'nationality'])
+
+        c_constructors = Matcher('constructors', log=self.log).match(
+            e_constructors,
+            j_constructors,
+            'constructorIdErgast', 'constructorId',
+            name='name',
+            block='nationality',
+        )
+        return c_constructors[['constructorIdErgast', 'name', 'constructorId', 'url', 'nationality']]
+
+    def create_circuits(self, ergast: dict[str, pd.DataFrame]) -> pd.DataFrame:
+        circutis_old_map_columns = {
+            'circuitId': 'circuitIdErgast',
+            'name': 'circuitName',
+            'location': 'locality',
+            'country': 'country',
+            'lat': 'lat',
+            'lng': 'long',
+            'url': 'url',
+        }
 
-            e_circuits = circuits[list(circutis_old_map_columns.keys())].rename(columns=circutis_old_map_columns)
-
-            j_circuits = pd.DataFrame()
-            offset = 0
-            total = 1
-            while j_circuits.shape[0] < total:
-                print(f"circuits: {j_circuits.shape[0]} / {total}")
-                temp = self.jolpica.circuits(offset=offset)
-                j_circuits = pd.concat([j_circuits, pd.DataFrame(temp['MRData']['CircuitTable']['Circuits'])], ignore_index=True)
-                total = int(temp['MRData']['total'])
-                offset += 100
-
-            c_circuits = pd.merge(
-                e_circuits,
-                j_circuits[['circuitName', 'circuitId']],
-                on='circuitName',
-                how='outer',
-            )
-            return c_circuits
-        c_circuits = create_circuits()
-
-        print("\tRaces...")
-        def create_races():
-            races_old_map_columns = {
-                'raceId': 'raceIdErgast',
-                'year': 'season',
-                'round': 'round',
-                'circuitId': 'circuitId',
-                'name': 'raceName',
-                'date': 'date',
-                'url': 'url',
-            }
-            e_races = races[list(races_old_map_columns.keys())].rename(columns=races_old_map_columns)
-
-            e_races['circuitId'] = e_races['circuitId'].map(c_circuits.set_index('circuitIdErgast')['circuitId'].to_dict())
-
-            last_season = e_races[e_races.date == e_races.date.max()].season.iloc[0].item()
-
-            j_races = pd.DataFrame()
-            for season in range(last_season, datetime.datetime.today().year + 1):
-                print(season)
-                temp = self.jolpica.races(season=season)
-                j_races = pd.concat([
-                    j_races,
-                    pd.DataFrame(temp['MRData']['RaceTable']['Races'])
-                ], ignore_index=True)
-
-            j_races['circuitId'] = j_races['Circuit'].apply(lambda x: x['circuitId'])
-
-            j_races = j_races[['season', 'round', 'circuitId', 'raceName', 'date', 'url']]
-            j_races['season'] = j_races['season'].astype(int)
-            j_races['round'] = j_races['round'].astype(int)
-
-            c_races = pd.concat([e_races, j_races], ignore_index=True).drop_duplicates(subset=['season', 'round'], keep='first').sort_values(by=['season', 'round'])
-            return c_races
-        c_races = create_races()
-
-        print("\tConstructor standings...")
-        def create_constructor_standings():
-            constructor_standings_old_map_columns = {
-                'raceId': 'raceId',
-                'constructorId': 'constructorId',
-                'points': 'points',
-                'position': 'position',
-                'wins': 'wins',
-            }
+        e_circuits = ergast['circuits'][list(circutis_old_map_columns.keys())].rename(columns=circutis_old_map_columns)
+
+        records = list(self.jolpica.paginate('circuits', workers=self.workers))
+        j_circuits = pd.DataFrame(records, columns=['circuitId', 'circuitName'])
+        j_circuits['country'] = [record.get('Location', {}).get('country') for record in records]
+
+        c_circuits = Matcher('circuits', log=self.log).match(
+            e_circuits,
+            j_circuits,
+            'circuitIdErgast', 'circuitId',
+            name='circuitName',
+            block='country',
+        )
+        return c_circuits
+
+    def create_races(self, ergast: dict[str, pd.DataFrame], c_circuits: pd.DataFrame) -> pd.DataFrame:
+        races_old_map_columns = {
+            'raceId': 'raceIdErgast',
+            'year': 'season',
+            'round': 'round',
+            'circuitId': 'circuitId',
+            'name': 'raceName',
+            'date': 'date',
+            'url': 'url',
+        }
+        e_races = ergast['races'][list(races_old_map_columns.keys())].rename(columns=races_old_map_columns)
 
-            e_constructor_standings = constructor_standings[list(constructor_standings_old_map_columns.keys())].rename(columns=constructor_standings_old_map_columns)
-
-            e_constructor_standings = pd.merge(
-                e_constructor_standings.assign(raceId=e_constructor_standings.raceId.astype(float)),
-                c_races[['raceIdErgast', 'season', 'round']].rename(columns={'raceIdErgast': 'raceId'}),
-                how='left',
-                on='raceId',
-            ).drop(columns=['raceId'])
-
-            e_constructor_standings['constructorId'] = e_constructor_standings['constructorId'].map(c_constructors.set_index('constructorIdErgast')['constructorId'].to_dict())
-
-            missing_season_races = set([(x[0].item(), x[1].item()) for x in c_races[['season', 'round']].to_numpy()]) \
-                - set([(x[0].item(), x[1].item()) for x in e_constructor_standings[['season', 'round']].to_numpy()])
-
-            last_season = max(missing_season_races)[0]
-            last_round_last_season = int(self.jolpica.constructor_standing(last_season)['MRData']['StandingsTable']['round'])
-            missing_season_races = [x for x in missing_season_races if x <= (last_season, last_round_last_season)]
-            missing_season_races = [x for x in missing_season_races if x[0] > 2000]
-
-            j_constructors_standing = pd.DataFrame()
-            for season, round in tqdm(missing_season_races):
-                temp = self.jolpica.constructor_standing(season=season, round=round)
-                temp_df = pd.DataFrame(temp['MRData']['StandingsTable']['StandingsLists'][0]['ConstructorStandings'])
-                temp_df['season'] = season
-                temp_df['round'] = round
-                temp_df['constructorId'] = temp_df['Constructor'].apply(lambda x: x['constructorId'])
-                j_constructors_standing = pd.concat([
-                    j_constructors_standing,
-                    temp_df
-                ], ignore_index=True)
-
-            j_constructors_standing = j_constructors_standing[['season', 'round', 'constructorId', 'points', 'position', 'wins']]
-
-            c_constructor_standings = pd.concat([
-                e_constructor_standings,
-                j_constructors_standing
-            ], ignore_index=True).drop_duplicates(subset=['season', 'round', 'constructorId'], keep='first').sort_values(by=['season', 'round'])
-            return c_constructor_standings
-        c_constructor_standings = create_constructor_standings()
-
-        print("\tDriver standings...")
-        def create_constructor_standings():
-            driver_standings_old_map_columns = {
-                'driverId': 'driverId',
-                'points': 'points',
-                'position': 'position',
-                'wins': 'wins',
-
-                'raceId': 'raceId',
-            }
+        e_races['circuitId'] = e_races['circuitId'].map(c_circuits.set_index('circuitIdErgast')['circuitId'].to_dict())
+
+        last_season = e_races[e_races.date == e_races.date.max()].season.iloc[0].item()
+
+        seasons = list(range(last_season, datetime.datetime.today().year + 1))
+        records = self.races_records(self.jolpica.paginate_seasons('races', seasons, workers=self.workers))
 
-            e_driver_standings = driver_standings[list(driver_standings_old_map_columns.keys())].rename(columns=driver_standings_old_map_columns)
+        j_races = pd.DataFrame(records, columns=self.RACES_COLUMNS).astype(self.RACES_DTYPES)
 
-            e_driver_standings['driverId'] = e_driver_standings['driverId'].astype(float).map(c_drivers.dropna(subset=['driverIdErgast']).set_index('driverIdErgast')['driverId'].to_dict())
+        c_races = pd.concat([e_races, j_races], ignore_index=True).drop_duplicates(subset=['season', 'round'], keep='first').sort_values(by=['season', 'round'])
+        return c_races
 
-            e_driver_standings = pd.merge(
-                e_driver_standings,
-                c_races[['raceIdErgast', 'season', 'round']].rename(columns={'raceIdErgast': 'raceId'}),
-                how='left',
-            ).drop(columns=['raceId'])
+    def create_constructor_standings(self, ergast: dict[str, pd.DataFrame], c_races: pd.DataFrame, c_constructors: pd.DataFrame) -> pd.DataFrame:
+        constructor_standings_old_map_columns = {
+            'raceId': 'raceId',
+            'constructorId': 'constructorId',
+            'points': 'points',
+            'position': 'position',
+            'wins': 'wins',
+        }
 
-            missing_season_races = set([(x[0].item(), x[1].item()) for x in c_constructor_standings[['season', 'round']].to_numpy()])
+        e_constructor_standings = ergast['constructor_standings'][list(constructor_standings_old_map_columns.keys())].rename(columns=constructor_standings_old_map_columns)
+
+        e_constructor_standings = pd.merge(
+            e_constructor_standings.assign(raceId=e_constructor_standings.raceId.astype(float)),
+            c_races[['raceIdErgast', 'season', 'round']].rename(columns={'raceIdErgast': 'raceId'}),
+            how='left',
+            on='raceId',
+        ).drop(columns=['raceId'])
+
+        e_constructor_standings['constructorId'] = e_constructor_standings['constructorId'].map(c_constructors.set_index('constructorIdErgast')['constructorId'].to_dict())
+
+        missing_season_races = set([(x[0].item(), x[1].item()) for x in c_races[['season', 'round']].to_numpy()]) \
+            - set([(x[0].item(), x[1].item()) for x in e_constructor_standings[['season', 'round']].to_numpy()])
+
+        last_season = max(missing_season_races)[0]
+        last_round_last_season = int(self.jolpica.constructor_standing(last_season)['MRData']['StandingsTable']['round'])
+        missing_season_races = [x for x in missing_season_races if x <= (last_season, last_round_last_season)]
+        missing_season_races = sorted(x for x in missing_season_races if x[0] > 2000)
+
+        # Calcula as rodadas a partir dos resultados de cada temporada e só busca na API as temporadas que não batem
+        seasons = sorted(set(season for season, _ in missing_season_races))
+        responses = self.jolpica.fetch_many(self.jolpica.constructor_standing, [{'season': season} for season in seasons], workers=self.workers)
+        oracle = pd.DataFrame(
+            [record for season, temp in zip(seasons, responses) for record in self.constructor_standings_records(season, None, temp)],
+            columns=self.CONSTRUCTOR_STANDINGS_COLUMNS,
+        ).astype(self.STANDINGS_DTYPES)
+        j_constructors_standing = self.computed_standings(
+            self.standings.constructor_standings(seasons), oracle, 'constructorId', missing_season_races,
+            lambda season_races: self.fetch_standings(
+                self.jolpica.constructor_standing, self.constructor_standings_records, self.CONSTRUCTOR_STANDINGS_COLUMNS, season_races,
+            ),
+        )
+
+        c_constructor_standings = pd.concat([
+            e_constructor_standings,
+            j_constructors_standing
+        ], ignore_index=True).drop_duplicates(subset=['season', 'round', 'constructorId'], keep='first').sort_values(by=['season', 'round'])
+        return c_constructor_standings
+
+    def create_driver_standings(self, ergast: dict[str, pd.DataFrame], c_races: pd.DataFrame, c_drivers: pd.DataFrame, c_constructor_standings: pd.DataFrame) -> pd.DataFrame:
+        driver_standings_old_map_columns = {
+            'driverId': 'driverId',
+            'points': 'points',
+            'position': 'position',
+            'wins': 'wins',
+
+            'raceId': 'raceId',
+        }
 
-            seasons = list(set([x[0] for x in missing_season_races]))
+        e_driver_standings = ergast['driver_standings'][list(driver_standings_old_map_columns.keys())].rename(columns=driver_standings_old_map_columns)
 
-            drivers_constructors_seasons = pd.DataFrame()
-            for season in tqdm(seasons):
-                temp = self.jolpica.driver_standing(season=season)
-                temp_df = pd.DataFrame(temp['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings'])
-                temp_df['season'] = season
-                drivers_constructors_seasons = pd.concat([
-                    drivers_constructors_seasons,
-                    temp_df
-                ], ignore_index=True)
+        e_driver_standings['driverId'] = e_driver_standings['driverId'].astype(float).map(c_drivers.dropna(subset=['driverIdErgast']).set_index('driverIdErgast')['driverId'].to_dict())
 
-            drivers_constructors_seasons['constructorId'] = drivers_constructors_seasons['Constructors'].apply(lambda x: x[0]['constructorId'])
-            drivers_constructors_seasons['driverId'] = drivers_constructors_seasons['Driver'].apply(lambda x: x['driverId'])
+        e_driver_standings = pd.merge(
+            e_driver_standings,
+            c_races[['raceIdErgast', 'season', 'round']].rename(columns={'raceIdErgast': 'raceId'}),
+            how='left',
+        ).drop(columns=['raceId'])
 
-            e_driver_standings = pd.merge(
-                e_driver_standings,
-                drivers_constructors_seasons[['driverId', 'constructorId', 'season']],
-                on=['driverId', 'season'],
-                how='left'
-            )
+        missing_season_races = set([(x[0].item(), x[1].item()) for x in c_constructor_standings[['season', 'round']].to_numpy()])
 
-            missing_season_races = set([(x[0].item(), x[1].item()) for x in c_races[['season', 'round']].to_numpy()]) \
-                - set([(x[0].item(), x[1].item()) for x in e_driver_standings[['season', 'round']].to_numpy()])
-
-            last_season = max(missing_season_races)[0]
-            last_round_last_season = int(self.jolpica.driver_standing(last_season)['MRData']['StandingsTable']['round'])
-            missing_season_races = [x for x in missing_season_races if x <= (last_season, last_round_last_season)]
-            missing_season_races = [x for x in missing_season_races if x[0] > 2000]
-
-            j_drivers_standing = pd.DataFrame()
-            for season, round in tqdm(missing_season_races):
-                temp = self.jolpica.driver_standing(season=season, round=round)
-                temp_df = pd.DataFrame(temp['MRData']['StandingsTable']['StandingsLists'][0]['DriverStandings'])
-                temp_df['season'] = season
-                temp_df['round'] = round
-                temp_df['driverId'] = temp_df['Driver'].apply(lambda x: x['driverId'])
-                temp_df['constructorId'] = temp_df['Constructors'].apply(lambda x: x[0]['constructorId'])
-                j_drivers_standing = pd.concat([
-                    j_drivers_standing,
-                    temp_df
-                ], ignore_index=True)
-
-            j_drivers_standing = j_drivers_standing[['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'wins']]
-
-            c_driver_standings = pd.concat([
-                e_driver_standings,
-                j_drivers_standing
-            ], ignore_index=True).drop_duplicates(subset=['season', 'round', 'driverId'], keep='first').sort_values(by=['season', 'round'])
-            return c_driver_standings
-        c_driver_standings = create_constructor_standings()
-    
-        self.dados = {
-            'drivers': c_drivers,
-            'constructors': c_constructors,
-            'circuits': c_circuits,
-            'races': c_races,
-            'constructor_standings': c_constructor_standings,
-            'driver_standings': c_driver_standings,
-        }
+        seasons = sorted(set([x[0] for x in missing_season_races]))
 
-        self.save()
+        responses = self.jolpica.fetch_many(
+            self.jolpica.driver_standing,
+            [{'season': season} for season in seasons],
+            workers=self.workers,
+        )
+
+        records = [
+            record
+            for season, temp in zip(seasons, responses)
+            for record in self.driver_standings_records(season, None, temp)
+        ]
+        drivers_constructors_seasons = pd.DataFrame(records, columns=self.DRIVER_STANDINGS_COLUMNS).astype(self.STANDINGS_DTYPES)
+
+        e_driver_standings = pd.merge(
+            e_driver_standings,
+            drivers_constructors_seasons[['driverId', 'constructorId', 'season']],
+            on=['driverId', 'season'],
+            how='left'
+        )
+
+        missing_season_races = set([(x[0].item(), x[1].item()) for x in c_races[['season', 'round']].to_numpy()]) \
+            - set([(x[0].item(), x[1].item()) for x in e_driver_standings[['season', 'round']].to_numpy()])
+
+        last_season = max(missing_season_races)[0]
+        last_round_last_season = int(self.jolpica.driver_standing(last_season)['MRData']['StandingsTable']['round'])
+        missing_season_races = [x for x in missing_season_races if x <= (last_season, last_round_last_season)]
+        missing_season_races = sorted(x for x in missing_season_races if x[0] > 2000)
+
+        # A classificação de cada temporada já buscada acima serve de conferência para as rodadas calculadas
+        j_drivers_standing = self.computed_standings(
+            self.standings.driver_standings(sorted(set(season for season, _ in missing_season_races))),
+            drivers_constructors_seasons, 'driverId', missing_season_races,
+            lambda season_races: self.fetch_standings(
+                self.jolpica.driver_standing, self.driver_standings_records, self.DRIVER_STANDINGS_COLUMNS, season_races,
+            ),
+        )
+
+        c_driver_standings = pd.concat([
+            e_driver_standings,
+            j_drivers_standing
+        ], ignore_index=True).drop_duplicates(subset=['season', 'round', 'driverId'], keep='first').sort_values(by=['season', 'round'])
+        return c_driver_standings
+
+    def computed_standings(self, computed: pd.DataFrame, oracle: pd.DataFrame, entity: str,
+                           season_races: list[tuple[int, int]], fetch) -> pd.DataFrame:
+        # Classificação de cada rodada de season_races: calculada onde bate com a API, senão buscada rodada a rodada.
+        # oracle traz a última rodada de cada temporada; fetch(season_races) busca rodadas na API
+        seasons = sorted(set(season for season, _ in season_races))
+        wrong = disagreements(computed, oracle[oracle.season.isin(seasons)], entity)
+        wrong |= set(season for season, round in set(season_races) - set(zip(computed.season, computed['round'])))
+        if wrong:
+            self.log(f"Computed {entity} standings differ from the API in {sorted(wrong)}, fetching them by round.")
+
+        # Um desempate diferente no meio da temporada não aparece na última rodada: as últimas temporadas que
+        # passaram são conferidas em todas as rodadas e, se alguma posição diverge, nenhuma calculada é usada
+        checked = [season for season in seasons if season not in wrong][-SPOT_CHECKS:]
+        fetched = fetch([x for x in season_races if x[0] in checked])
+        differ = disagreements(computed, fetched, entity)
+        if differ:
+            self.log(f"Computed {entity} standings differ from the API by round in {sorted(differ)}, fetching every season by round.")
+            wrong = set(seasons) - set(checked)
+
+        offline = [(season, round) for season, round in season_races if season not in wrong and season not in checked]
+        computed = computed.merge(pd.DataFrame(offline, columns=['season', 'round'], dtype='int64'), on=['season', 'round'])
+        return pd.concat([
+            computed.astype(self.STANDINGS_DTYPES),
+            fetched,
+            fetch([x for x in season_races if x[0] in wrong]),
+        ], ignore_index=True)
+
+    def fetch_standings(self, method, records, columns: list[str], season_races: list[tuple[int, int]]) -> pd.DataFrame:
+        responses = self.jolpica.fetch_many(
+            method,
+            [{'season': season, 'round': round} for season, round in season_races],
+            workers=self.workers,
+        )
+        return pd.DataFrame(
+            [record for (season, round), response in zip(season_races, responses) for record in records(season, round, response)],
+            columns=columns,
+        ).astype(self.STANDINGS_DTYPES)
+
+    @staticmethod
+    def races_records(races: list[dict]) -> list[dict]:
+        return [
+            {
+                'season': int(race['season']),
+                'round': int(race['round']),
+                'circuitId': race['Circuit']['circuitId'],
+                'raceName': race['raceName'],
+                'date': race['date'],
+                'url': race.get('url'),
+            }
+            for race in races
+        ]
+
+    @staticmethod
+    def constructor_standings_records(season: int, round: int, response: dict) -> list[dict]:
+        return [
+            {
+                'season': season,
+                'round': round or int(standing_list['round']),
+                'constructorId': standing['Constructor']['constructorId'],
+                'points': float(standing['points']),
+                'position': int(standing['position']) if 'position' in standing else None,
+                'wins': int(standing['wins']),
+            }
+            for standing_list in response['MRData']['StandingsTable']['StandingsLists'][:1]
+            for standing in standing_list['ConstructorStandings']
+        ]
+
+    @staticmethod
+    def driver_standings_records(season: int, round: int, response: dict) -> list[dict]:
+        return [
+            {
+                'season': season,
+                'round': round or int(standing_list['round']),
+                'driverId': standing['Driver']['driverId'],
+                'constructorId': standing['Constructors'][0]['constructorId'],
+                'points': float(standing['points']),
+                'position': int(standing['position']) if 'position' in standing else None,
+                'wins': int(standing['wins']),
+            }
+            for standing_list in response['MRData']['StandingsTable']['StandingsLists'][:1]
+            for standing in standing_list['DriverStandings']
+        ]
 
     def update(self):
-        # TODO: Implement update method
-        print("Updating database...")
-        Utils.delete_folder(self.directory)
-        os.makedirs(self.directory, exist_ok=True)
-        self.create()
-        self.clean()
-        print("Database updated.")
+        self.log("Updating database...")
+        missing = [df_name for df_name in self.df_names if not self.storage.exists(df_name)]
+        if missing:
+            self.log(f"Missing tables {missing}, creating database from scratch.")
+            self.create()
+            return
 
-    def load(self):
+        self.load()
+        changed = set()
+
+        last_season, last_round = min(
+            self.dados[df_name][['season', 'round']].astype(int).apply(tuple, axis=1).max()
+            for df_name in ['constructor_standings', 'driver_standings']
+        )
+        self.log(f"Last round in database: {last_season}/{last_round}")
+
+        seasons = list(range(last_season, datetime.date.today().year + 1))
+        self.log("\tRaces...")
+        j_races = pd.DataFrame(
+            self.races_records(self.jolpica.paginate_seasons('races', seasons, workers=self.workers)),
+            columns=self.RACES_COLUMNS,
+        ).astype(self.RACES_DTYPES)
+        if self.upsert('races', j_races, ['season', 'round'], sort=True):
+            changed.add('races')
+
+        j_circuits = j_races[~j_races.circuitId.isin(self.dados['circuits'].circuitId)]
+        if not j_circuits.empty:
+            self.log("\tCircuits...")
+            circuits = self.jolpica.paginate_seasons('circuits', sorted(j_circuits.season.unique()), workers=self.workers)
+            new_circuits = pd.DataFrame([
+                {
+                    'circuitName': circuit['circuitName'],
+                    'locality': circuit['Location']['locality'],
+                    'country': circuit['Location']['country'],
+                    'lat': float(circuit['Location']['lat']),
+                    'long': float(circuit['Location']['long']),
+                    'url': circuit.get('url'),
+                    'circuitId': circuit['circuitId'],
+                }
+                for circuit in circuits
+            ]).drop_duplicates(subset=['circuitId'])
+            if self.upsert('circuits', new_circuits[new_circuits.circuitId.isin(j_circuits.circuitId)], ['circuitId']):
+                changed.add('circuits')
+
+        last_rounds = {}
+        for season in seasons:
+            standings = self.jolpica.driver_standing(season)['MRData']['StandingsTable']
+            if standings['StandingsLists']:
+                last_rounds[season] = int(standings['round'])
+        new_season_races = sorted(
+            (season, round) for season, round in self.dados['races'][['season', 'round']].astype(int).itertuples(index=False)
+            if (season, round) > (last_season, last_round) and round <= last_rounds.get(season, 0)
+        )
+        if not new_season_races:
+            if changed:
+                self.save(changed)
+            self.log("Database already up to date.")
+            return
+        self.log(f"New rounds: {new_season_races}")
+
+        self.log("\tConstructor standings...")
+        responses = self.jolpica.fetch_many(
+            self.jolpica.constructor_standing,
+            [{'season': season, 'round': round} for season, round in new_season_races],
+            workers=self.workers,
+        )
+        j_constructor_standings = pd.DataFrame(
+            [
+                record
+                for (season, round), response in zip(new_season_races, responses)
+                for record in self.constructor_standings_records(season, round, response)
+            ],
+            columns=self.CONSTRUCTOR_STANDINGS_COLUMNS,
+        ).astype(self.STANDINGS_DTYPES)
+
+        self.log("\tDriver standings...")
+        responses = self.jolpica.fetch_many(
+            self.jolpica.driver_standing,
+            [{'season': season, 'round': round} for season, round in new_season_races],
+            workers=self.workers,
+        )
+        j_driver_standings = pd.DataFrame(
+            [
+                record
+                for (season, round), response in zip(new_season_races, responses)
+                for record in self.driver_standings_records(season, round, response)
+            ],
+            columns=self.DRIVER_STANDINGS_COLUMNS,
+        ).astype(self.STANDINGS_DTYPES)
+
+        if self.upsert('constructor_standings', j_constructor_standings, ['season', 'round', 'constructorId'], sort=True):
+            changed.add('constructor_standings')
+        if self.upsert('driver_standings', j_driver_standings, ['season', 'round', 'driverId'], sort=True):
+            changed.add('driver_standings')
+
+        new_seasons = sorted(set(season for season, _ in new_season_races))
+        if not j_driver_standings.empty and not j_driver_standings.driverId.isin(self.dados['drivers'].driverId).all():
+            self.log("\tDrivers...")
+            new_drivers = pd.DataFrame(
+                self.jolpica.paginate_seasons('drivers', new_seasons, workers=self.workers)
+            ).drop_duplicates(subset=['driverId'])
+            new_drivers = new_drivers[new_drivers.driverId.isin(j_driver_standings.driverId)]
+            new_drivers = new_drivers.reindex(columns=['driverId', 'code', 'givenName', 'familyName', 'dateOfBirth', 'nationality', 'url'])
+            if self.upsert('drivers', new_drivers, ['driverId']):
+                changed.add('drivers')
+
+        if not j_constructor_standings.empty and not j_constructor_standings.constructorId.isin(self.dados['constructors'].constructorId).all():
+            self.log("\tConstructors...")
+            new_constructors = pd.DataFrame(
+                self.jolpica.paginate_seasons('constructors', new_seasons, workers=self.workers)
+            ).drop_duplicates(subset=['constructorId'])
+            new_constructors = new_constructors[new_constructors.constructorId.isin(j_constructor_standings.constructorId)]
+            new_constructors = new_constructors.reindex(columns=['name', 'constructorId', 'url', 'nationality'])
+            if self.upsert('constructors', new_constructors, ['constructorId']):
+                changed.add('constructors')
+
+        if changed:
+            self.save(changed)
+        self.log("Database updated.")
+
+    def upsert(self, df_name: str, new: pd.DataFrame, keys: list[str], sort: bool = False) -> bool:
+        # Atualiza as colunas recebidas das linhas existentes e adiciona as novas; retorna se a tabela mudou
+        if new.empty:
+            return False
+        old = self.dados[df_name]
+        current = old.set_index(keys)
+        incoming = new.drop_duplicates(subset=keys, keep='last').set_index(keys)
+        columns = incoming.columns.intersection(current.columns)
+
+        common = incoming.index.intersection(current.index)
+        modified = not current.loc[common, columns].astype(str).equals(incoming.loc[common, columns].astype(str))
+        added = incoming[~incoming.index.isin(current.index)]
+        if not modified and added.empty:
+            return False
+
+        # Inteiros viram Int64 para aceitar os vazios das linhas novas; as linhas novas chegam com os dtypes da tabela,
+        # assim o concat não depende das colunas todas vazias
+        current = current.astype({column: 'Int64' for column in current.select_dtypes('integer').columns})
+        current.loc[common, columns] = incoming.loc[common, columns]
+        added = added.reindex(columns=current.columns).astype(current.dtypes.to_dict(), errors='ignore')
+        merged = pd.concat([current, added]).reset_index()[old.columns]
+        merged = merged.astype({column: 'Int64' for column in old.select_dtypes('integer').columns})
+        if sort:
+            merged = merged.sort_values(by=['season', 'round'], kind='stable').reset_index(drop=True)
+        self.dados[df_name] = merged
+        return True
+
+    def load(self, columns: dict[str, list[str]] = None, seasons: list[int] = None):
         self.dados = {}
-        for arquivo in tqdm(os.listdir(self.diretorio)):
-            self.dados[arquivo.replace('.csv', '')] = pd.read_csv(os.path.join(self.diretorio, arquivo))
+        with self.instrumentation.stage('load') as info:
+            for df_name in self.instrumentation.progress(self.df_names):
+                self.dados[df_name] = self.read(df_name, (columns or {}).get(df_name), seasons)
+            info['rows'] = count_rows(self.dados)
+
+    def read(self, df_name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        return self.storage.load(df_name, columns=columns, seasons=seasons)
 
     def validate(self):
-        print("Validating data...")
+        with self.instrumentation.stage('validate') as info:
+            self.__validate()
+            info['rows'] = count_rows(self.dados)
 
-        print("Validating standings...")
+    def __validate(self):
+        self.log("Validating data...")
+
+        self.log("Validating standings...")
         def tratar_posicoes(standings: pd.DataFrame):
-            contains_nan = not all(standings.groupby(['season', 'round']).apply(lambda x: x['position'].nunique() == x.shape[0], include_groups=False))
-            if contains_nan:
-                standings['position'] = pd.to_numeric(standings['position'])
-                standings = standings.groupby(['season', 'round'], group_keys=True).apply(
-                    lambda x: x.sort_values('position').assign(position=lambda y: y['position'].ffill() + y['position'].isna().cumsum()) if x['position'].isna().any() else x,
-                    include_groups=False
-                ).reset_index().drop(columns='level_2', axis=1)
-            return standings
+            keys = ['season', 'round']
+            positions = standings.groupby(keys)['position']
+            if (positions.nunique() == positions.size()).all():
+                return standings
+
+            # Nas corridas com posições faltando: ordena por posição (NaN no fim) e numera os NaN após a última conhecida
+            standings = standings.dropna(subset=keys).assign(position=lambda x: pd.to_numeric(x['position']))
+            missing = standings['position'].isna().groupby([standings[key] for key in keys]).transform('any')
+            standings = standings.assign(order=standings['position'].where(missing, 0)).sort_values(keys + ['order'], kind='stable')
+            missing = standings['position'].isna().groupby([standings[key] for key in keys]).transform('any')
+            blanks = standings['position'].isna().astype(int).groupby([standings[key] for key in keys]).cumsum()
+            filled = standings.groupby(keys)['position'].ffill() + blanks
+            standings['position'] = filled.where(missing, standings['position'])
+            columns = keys + [column for column in standings.columns if column not in keys + ['order']]
+            return standings[columns].reset_index(drop=True)
         self.dados['driver_standings'] = tratar_posicoes(self.dados['driver_standings'])
         self.dados['constructor_standings'] = tratar_posicoes(self.dados['constructor_standings'])
 
-        print("Validated...")
+        self.log("Validated...")
 
-    def save(self):
+    def save(self, df_names: list[str] = None):
         self.validate()
-        print("Saving data...")
-        for df_name in self.df_names:
-            self.dados[df_name].to_csv(os.path.join(self.directory, f'{df_name}.csv'), index=False)
-        print("Data saved.")
+        self.log("Saving data...")
+        with self.instrumentation.stage('save') as info:
+            # Com uma versão já publicada, as tabelas anteriores viram a base dos deltas de linhas
+            previous = {}
+            if load_release(self.directory):
+                previous = {df_name: self.read(df_name) for df_name in df_names or self.df_names if self.storage.exists(df_name)}
+            for df_name in df_names or self.df_names:
+                self.dados[df_name] = apply_schema(df_name, self.dados[df_name])
+                for storage in self.storages:
+                    storage.save(df_name, self.dados[df_name])
+            if all(df_name in self.dados for df_name in self.df_names):
+                written = write_season_bundles(self.dados, self.directory)
+                self.log(f"Season bundles written: {written}")
+            version = publish(self.directory, {
+                df_name: table_delta(old, self.dados[df_name], TABLE_KEYS[df_name]) for df_name, old in previous.items()
+            })
+            self.log(f"Published version {version}")
+            info['rows'] = count_rows({df_name: self.dados[df_name] for df_name in df_names or self.df_names})
+        self.log("Data saved.")
 
     def clean(self):
-        print("Cleaning up...")
+        self.log("Cleaning up...")
         if os.path.exists(self.ergast_folder):
             shutil.rmtree(self.ergast_folder)
         else:
-            print(f"Folder {self.ergast_folder} does not exist.")
-        print("Cleaning up complete.")
+            self.log(f"Folder {self.ergast_folder} does not exist.")
+        self.log("Cleaning up complete.")
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('command', choices=['create', 'update'])
+    parser.add_argument('directory')
+    parser.add_argument('--workers', type=int, default=1, help='Concurrent requests to the Jolpica API')
+    parser.add_argument('--cache-dir', default='.cache', help='Folder of the Jolpica response cache')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the Jolpica response cache')
+    parser.add_argument('--prune-cache', choices=['expired', 'all'], help='Prune the response cache before running')
+    parser.add_argument('--restart', action='store_true', help='Ignore checkpoints of a previous failed create')
+    parser.add_argument('--storage', nargs='+', choices=list(STORAGES), default=['csv'], help='Formats to save the tables in; the first one is read by update')
+    parser.add_argument('--jolpica-url', help='Base url of the Jolpica API, e.g. a local stand-in from manager.replay')
+    parser.add_argument('--ergast-url', help='Url of the Ergast f1db_csv.zip archive')
+    parser.add_argument('--ergast-sha256', help='Expected SHA-256 of the Ergast archive; the download fails on a mismatch')
+    record = parser.add_mutually_exclusive_group()
+    record.add_argument('--record', metavar='FOLDER', help='Save every HTTP response to this fixtures folder')
+    record.add_argument('--replay', metavar='FOLDER', help='Answer every HTTP request from this fixtures folder, offline')
+    parser.add_argument('--quiet', action='store_true', help='No progress messages or bars')
+    parser.add_argument('--report', nargs='+', default=[], metavar='PATH',
+                        help='Write the stage and request events to these files: OpenMetrics for .prom/.txt, JSON lines otherwise')
+
+
+def run(args: argparse.Namespace, instrumentation: Instrumentation) -> DataBaseManager:
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(os.path.join(args.cache_dir, 'jolpica.sqlite'))
+        if args.prune_cache:
+            removed = cache.prune(everything=args.prune_cache == 'all')
+            instrumentation.log(f"Pruned {removed} cached responses.")
+
+    session = None
+    if args.record or args.replay:
+        # Só gravação e replay precisam do módulo (e do servidor http que ele traz)
+        from manager.replay import RecordingAdapter, ReplayAdapter, mount
+        if args.record:
+            session = mount(requests.Session(), RecordingAdapter(args.record, pool_maxsize=max(10, args.workers)))
+        else:
+            session = mount(requests.Session(), ReplayAdapter(args.replay))
+
+    database = DataBaseManager(
+        args.directory, workers=args.workers, cache=cache, storages=args.storage,
+        session=session, jolpica_url=args.jolpica_url, ergast_url=args.ergast_url,
+        ergast_sha256=args.ergast_sha256, instrumentation=instrumentation,
+    )
+    if args.command == 'create':
+        database.create(restart=args.restart)
+    elif args.command == 'update':
+        database.update()
+    return database
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python manager/database.py <command> <directory>")
-        sys.exit(1)
-    
-    command = sys.argv[1]
-    directory = sys.argv[2]
-    database = DataBaseManager(directory)
-    if command == 'create':
-        database.create()
-    elif command == 'update':
-        database.update()
-    else:
-        print(f"Unknown command: {command}")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(prog='python -m manager.database', description='Manage the F1 database')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    instrumentation = Instrumentation(quiet=args.quiet, reports=[report(path) for path in args.report])
+    status = 'error'
+    try:
+        run(args, instrumentation)
+        status = 'ok'
+    finally:
+        instrumentation.close(args.command, status)
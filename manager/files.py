@@ -0,0 +1,48 @@
+"""
+Atomic file writes
+
+Everything the manager writes (tables, bundles, release manifests, images,
+checkpoints, fixtures, reports) goes to <path>.tmp first and is moved over
+the destination with os.replace, so a reader never sees a half-written file
+and an interrupted run leaves the previous version in place. The bytes and
+JSON writers also leave a file alone when its content did not change.
+"""
+import contextlib
+import json
+import os
+
+
+@contextlib.contextmanager
+def replacing(path: str):
+    # Entrega o caminho temporário; o destino só é substituído se o bloco terminar sem erro
+    temporary = path + '.tmp'
+    try:
+        yield temporary
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.replace(temporary, path)
+
+
+def write_bytes(path: str, content: bytes) -> bool:
+    # Retorna se o arquivo foi escrito; com o mesmo conteúdo, o arquivo (e o mtime) ficam como estão
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    with replacing(path) as temporary, open(temporary, 'wb') as f:
+        f.write(content)
+    return True
+
+
+def write_json(path: str, data, indent: int = None, sort_keys: bool = False) -> bool:
+    # Sem indent, a forma compacta que o app baixa
+    content = json.dumps(data, ensure_ascii=False, indent=indent, sort_keys=sort_keys,
+                         separators=None if indent is not None else (',', ':'))
+    return write_bytes(path, content.encode('utf-8'))
+
+
+def read_json(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
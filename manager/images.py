@@ -3,22 +3,30 @@ Download images of drivers and teams
 
 Use png as default image format
 """
+import hashlib
+import io
 import os
 import sys
 import time
-from turtle import up
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
-from PIL import Image
-from tqdm import tqdm
+
+from manager.files import read_json, write_bytes, write_json
+from manager.instrumentation import Instrumentation
+from manager.publish import publish
 
 # --------------------------------------------------------------------------- #
 # CONFIGURAÇÃO GERAL
 # --------------------------------------------------------------------------- #
 DEFAULT_IMAGE_SIZE = (250, 250)
 START_SEASON = 2000
+NETWORK_WORKERS = 8
+# Além do png, gera <id>.webp para cada imagem
+WEBP = False
+PROCESS_WORKERS = os.cpu_count() or 1
 headers = {
     'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
     'accept-language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -35,55 +43,67 @@ headers = {
     'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36 OPR/118.0.0.0 (Edition std-2)',
 }
 
+session = requests.Session()
+session.headers.update(headers)
+session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=NETWORK_WORKERS))
+
+# Página de onde a url da imagem é extraída: parse(response) -> url
+Source = namedtuple('Source', ['url', 'params', 'parse'])
+
 
 # --------------------------------------------------------------------------- #
 # Drivers
 # --------------------------------------------------------------------------- #
-def get_driver_images_urls(drivers: pd.DataFrame):
-    drivers_images = {}
-    for _, driver in tqdm(drivers.iterrows(), total=drivers.shape[0], desc='Urls drivers'):
-        response = requests.get(driver.url, headers=headers)
-        soup = BeautifulSoup(response.text, features='lxml')
-        img_url = 'https:' + soup.find(class_='infobox-image').find('img')['src']
-        drivers_images[driver.driverId] = img_url
-    return drivers_images
+def parse_driver_page(response: requests.Response) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(response.text, features='lxml')
+    return 'https:' + soup.find(class_='infobox-image').find('img')['src']
+
+
+def driver_source(url: str) -> Source:
+    return Source(url, None, parse_driver_page)
 
 
 # --------------------------------------------------------------------------- #
 # Constructors
 # --------------------------------------------------------------------------- #
-def get_seeklogo_url(team: str):
-    params = {'q': team}
-    response = requests.get('https://seeklogo.com/search', params=params, headers=headers)
+SEEKLOGO_URL = 'https://seeklogo.com/search'
+
+
+def parse_seeklogo_page(response: requests.Response, team: str) -> str | None:
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(response.content, "lxml")
     img = soup.select_one("ul.logoGroupCt img.logoImage")
     if img is None or not img.get("src"):
-        print(f"Image not found for team: {team}")
         return None
     return img["src"]
 
 
-def get_constructors_images_urls(constructors: pd.DataFrame) -> dict[str, str]:
-    constructors_images = {}
-    for _, constructor in tqdm(constructors.iterrows(), desc='Urls constructors', total=len(constructors)):
-        url = get_seeklogo_url(constructor['name'])
-        if url is None:
-            continue
-        constructors_images[constructor.constructorId] = url
-    return constructors_images
+def constructor_source(team: str) -> Source:
+    return Source(SEEKLOGO_URL, {'q': team}, lambda response: parse_seeklogo_page(response, team))
 
 
 # --------------------------------------------------------------------------- #
 # Images
 # --------------------------------------------------------------------------- #
-def format_image(caminho_imagem):
-    if not (caminho_imagem.lower().endswith('.jpg') or caminho_imagem.lower().endswith('.png')):
-        raise ValueError("O arquivo precisa ser uma imagem .jpg ou .png")
+def render_image(conteudo: bytes, webp: bool = WEBP) -> dict[str, bytes]:
+    # PIL só é importado nos processos que renderizam
+    from PIL import Image
 
-    imagem = Image.open(caminho_imagem)
+    imagem = Image.open(io.BytesIO(conteudo))
     largura, altura = imagem.size
-
     lado = min(largura, altura)
+
+    # JPEG grande: decodifica já reduzido (potência de 2), mantendo o lado menor >= tamanho final
+    if imagem.format == 'JPEG':
+        imagem.draft('RGB', (DEFAULT_IMAGE_SIZE[0] * largura // lado, DEFAULT_IMAGE_SIZE[1] * altura // lado))
+        largura, altura = imagem.size
+        lado = min(largura, altura)
+    if imagem.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        imagem = imagem.convert('RGB')
+
     esquerda = (largura - lado) // 2
     topo = (altura - lado) // 2
     direita = esquerda + lado
@@ -93,62 +113,201 @@ def format_image(caminho_imagem):
 
     imagem_redimensionada = imagem_crop.resize(DEFAULT_IMAGE_SIZE, Image.LANCZOS)
 
-    if caminho_imagem.lower().endswith('.jpg'):
-        novo_caminho = os.path.splitext(caminho_imagem)[0] + '.png'
-        imagem_redimensionada.save(novo_caminho, 'PNG')
-        os.remove(caminho_imagem)
-    else:
-        imagem_redimensionada.save(caminho_imagem, 'PNG')
+    saidas = {}
+    buffer = io.BytesIO()
+    imagem_redimensionada.save(buffer, 'PNG', optimize=True)
+    saidas['png'] = buffer.getvalue()
+    if webp:
+        buffer = io.BytesIO()
+        imagem_redimensionada.save(buffer, 'WEBP', quality=90, method=6)
+        saidas['webp'] = buffer.getvalue()
+    return saidas
+
+
+def write_images(folder: str, id: str, saidas: dict[str, bytes]):
+    for extensao, conteudo in saidas.items():
+        write_bytes(os.path.join(folder, f'{id}.{extensao}'), conteudo)
+
+
+class ImageManifest:
+
+    # id -> url da imagem, ETag/Last-Modified (da página e da imagem) e hashes da origem e do png final
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            self.entries = read_json(path)
 
+    def get(self, key: str) -> dict:
+        return self.entries.get(key, {})
 
-def download_image(url: str, id: str, folder: str):
+    def update(self, key: str, values: dict):
+        self.entries.setdefault(key, {}).update(values)
+
+    def save(self):
+        write_json(self.path, self.entries, indent=1, sort_keys=True)
+
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def conditional_get(url: str, params: dict = None, etag: str = None, last_modified: str = None) -> requests.Response:
+    conditional = {}
+    if etag:
+        conditional['If-None-Match'] = etag
+    if last_modified:
+        conditional['If-Modified-Since'] = last_modified
+    return session.get(url, params=params, headers=conditional)
+
+
+def resolve_image_url(source: Source | str, entry: dict) -> tuple[str | None, dict]:
+    # Com a página em cache, um 304 confirma que a url da imagem não mudou
+    if isinstance(source, str):
+        return source, {}
+    if not entry.get('url'):
+        entry = {}
+    response = conditional_get(source.url, source.params, entry.get('page_etag'), entry.get('page_last_modified'))
+    if response.status_code == 304:
+        return entry['url'], {}
+    return source.parse(response), {
+        'page_etag': response.headers.get('ETag'),
+        'page_last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def fetch_image(url: str, id: str, entry: dict = None) -> tuple[bytes | None, dict]:
+    # Retorna os bytes baixados (None se a origem não mudou) e os metadados da origem
+    entry = entry if entry and entry.get('url') == url else {}
+    response = None
     for _ in range(5):
         try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
+            response = conditional_get(url, etag=entry.get('etag'), last_modified=entry.get('last_modified'))
+            if response.status_code in (200, 304):
                 break
         except requests.exceptions.RequestException:
             pass
         time.sleep(3)
-    if response.status_code != 200:
-        print(f'\tError downloading image for driver {id}: {url}')
-        return
-    extension = url.split('.')[-1].split('?')[0]
-    image_path = os.path.join(folder, f'{id}.{extension.lower()}')
-    with open(image_path, 'wb') as f:
-        f.write(response.content)
-    format_image(image_path)
+    if response is None or response.status_code not in (200, 304):
+        raise IOError(f'Error downloading image {url}')
+    if response.status_code == 304:
+        return None, {}
+
+    metadata = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'source_sha256': sha256(response.content),
+    }
+    if metadata['source_sha256'] == entry.get('source_sha256'):
+        return None, metadata
+    return response.content, metadata
 
 
-def download_images(map_images: dict[str, str], folder: str):
+# Pipeline: url (threads) -> download (threads) -> render_image (processes).
+# `sources` maps each id to its image url or to the Source page it is
+# scraped from; each image moves to the next stage as soon as the previous
+# one finishes. With a manifest, pages and images are requested with
+# If-None-Match/If-Modified-Since and unchanged images are not reprocessed;
+# an image's manifest entry only changes once its download succeeded.
+def process_images(sources: dict, folder: str, manifest: ImageManifest = None, desc: str = 'Images',
+                   instrumentation: Instrumentation = None):
+    instrumentation = instrumentation or Instrumentation()
     os.makedirs(folder, exist_ok=True)
-    for id, url in tqdm(map_images.items(), desc='Download images', total=len(map_images)):
-        if os.path.exists(os.path.join(folder, f'{id}.png')):
-            continue
-        download_image(url, id, folder)
+    kind = os.path.basename(os.path.normpath(folder))
+
+    def entry(id: str) -> dict:
+        if manifest is None or not os.path.exists(os.path.join(folder, f'{id}.png')):
+            return {}
+        return manifest.get(f'{kind}/{id}')
+
+    if manifest is None:
+        sources = {id: source for id, source in sources.items() if not os.path.exists(os.path.join(folder, f'{id}.png'))}
+    if not sources:
+        return
+
+    with ThreadPoolExecutor(max_workers=NETWORK_WORKERS) as network, \
+            ProcessPoolExecutor(max_workers=PROCESS_WORKERS) as cpu, \
+            instrumentation.progress(total=len(sources), desc=desc) as progress:
+        stages = {network.submit(resolve_image_url, source, entry(id)): ('url', id) for id, source in sources.items()}
+        # Metadados de cada imagem ainda em andamento
+        pending = {}
+        while stages:
+            done, _ = wait(stages, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, id = stages.pop(future)
+                failed = False
+                try:
+                    result, metadata = future.result() if stage != 'format' else (future.result(), {})
+                except Exception as e:
+                    instrumentation.log(f'\tError on {stage} for {id}: {e}')
+                    result, metadata, failed = None, {}, True
+                pending.setdefault(id, {}).update(metadata)
+
+                if stage == 'url' and result is None and not failed:
+                    instrumentation.log(f'\tImage not found for {id}')
+                if stage == 'url' and result is not None:
+                    stages[network.submit(fetch_image, result, id, entry(id))] = ('download', id)
+                elif stage == 'download' and result is not None:
+                    stages[cpu.submit(render_image, result)] = ('format', id)
+                else:
+                    if stage == 'format' and result is not None:
+                        write_images(folder, id, result)
+                        pending[id]['output_sha256'] = sha256(result['png'])
+                    # Validadores da página e url só entram no manifesto com a imagem baixada (ou confirmada sem
+                    # mudança): gravados antes, um 304 da página na próxima execução reusaria a url antiga
+                    metadata = pending.pop(id)
+                    if manifest is not None and metadata and stage != 'url' and not failed:
+                        manifest.update(f'{kind}/{id}', metadata)
+                    progress.update()
 
 # --------------------------------------------------------------------------- #
 # Main
 # --------------------------------------------------------------------------- #
-def update_images(data_folder: str, images_folder: str):
+def update_images(data_folder: str, images_folder: str, dados: dict[str, pd.DataFrame] = None,
+                  instrumentation: Instrumentation = None):
+    # dados: tabelas já em memória (python -m manager.build); o que faltar é lido dos CSVs de data_folder
+    instrumentation = instrumentation or Instrumentation()
+    def table(name: str) -> pd.DataFrame:
+        if dados is not None and name in dados:
+            return dados[name]
+        return pd.read_csv(os.path.join(data_folder, f'{name}.csv'))
+
     os.makedirs(images_folder, exist_ok=True)
+    manifest = ImageManifest(os.path.join(images_folder, 'manifest.json'))
 
-    drivers = pd.read_csv('static/data/drivers.csv')
-    driver_standings = pd.read_csv('static/data/driver_standings.csv')
+    drivers = table('drivers')
+    driver_standings = table('driver_standings')
     drivers = drivers[drivers.driverId.isin(driver_standings[driver_standings.season >= START_SEASON].driverId.unique())]
-    drivers_images = get_driver_images_urls(drivers)
-    download_images(drivers_images, os.path.join(images_folder, 'drivers'))
+    process_images(
+        {driver.driverId: driver_source(driver.url) for driver in drivers.itertuples()},
+        os.path.join(images_folder, 'drivers'),
+        manifest=manifest,
+        desc='Drivers images',
+        instrumentation=instrumentation,
+    )
+    manifest.save()
 
-    constructors = pd.read_csv('static/data/constructors.csv')
-    constructor_standings = pd.read_csv('static/data/constructor_standings.csv')
+    constructors = table('constructors')
+    constructor_standings = table('constructor_standings')
     constructors = constructors[constructors.constructorId.isin(constructor_standings[constructor_standings.season >= START_SEASON].constructorId.unique())]
-    constructors_images = get_constructors_images_urls(constructors)
-    download_images(constructors_images, os.path.join(images_folder, 'constructors'))
+    process_images(
+        {constructor.constructorId: constructor_source(constructor.name) for constructor in constructors.itertuples()},
+        os.path.join(images_folder, 'constructors'),
+        manifest=manifest,
+        desc='Constructors images',
+        instrumentation=instrumentation,
+    )
+    manifest.save()
+    # manifest.json guarda ETags e hashes da origem: é do atualizador, não do que é publicado
+    version = publish(images_folder, exclude=['manifest.json'])
+    instrumentation.log(f"Published images version {version}")
 
 
 if __name__ == '__main__':
     if len(sys.argv) < 3:
-        print("Usage: python manager/images.py <data folder> <images folder>")
+        print("Usage: python -m manager.images <data folder> <images folder>")
         sys.exit(1)
     
     data_folder = sys.argv[1]
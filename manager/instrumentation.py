@@ -0,0 +1,160 @@
+"""
+Instrumentation of the database build
+
+Every create()/update() stage and every Jolpica request is recorded as an
+event: stage timings and row counts; request status, bytes, time spent
+waiting for the rate limit and on the network, retries and cache hits. The
+events go to the reports, as JSON lines written while the run goes or as an
+OpenMetrics text file written at the end, and the run closes with a summary
+event. Either report replaces the previous one only when the run closes. Progress messages and bars go through log()/progress(), so quiet mode
+silences them without touching the recorded events.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+from tqdm import tqdm
+
+from manager.files import replacing, write_bytes
+
+METRICS_PREFIX = 'f1db'
+
+
+def count_rows(result) -> int | None:
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict) and result and all(isinstance(value, pd.DataFrame) for value in result.values()):
+        return sum(len(value) for value in result.values())
+    return None
+
+
+class JsonLinesReport:
+
+    def __init__(self, path: str):
+        # As linhas vão para o .tmp durante a execução; o destino só é substituído no close()
+        self.path = path
+        self.stack = contextlib.ExitStack()
+        self.file = self.stack.enter_context(open(self.stack.enter_context(replacing(path)), 'w'))
+
+    def write(self, event: dict):
+        self.file.write(json.dumps(event) + '\n')
+        self.file.flush()
+
+    def close(self, events: list[dict]):
+        self.stack.close()
+
+
+class OpenMetricsReport:
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, event: dict):
+        pass
+
+    @staticmethod
+    def labels(**labels) -> str:
+        return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+    def close(self, events: list[dict]):
+        metrics = {}
+
+        def add(name: str, kind: str, help: str, labels: dict, value: float):
+            metric = metrics.setdefault(name, {'type': kind, 'help': help, 'samples': {}})
+            key = self.labels(**labels) if labels else ''
+            metric['samples'][key] = metric['samples'].get(key, 0) + value
+
+        for event in events:
+            if event['event'] == 'stage':
+                add('stage_seconds', 'gauge', 'Duration of each build stage', {'stage': event['stage']}, event['seconds'])
+                if event.get('rows') is not None:
+                    add('stage_rows', 'gauge', 'Rows produced by each build stage', {'stage': event['stage']}, event['rows'])
+            elif event['event'] == 'request':
+                labels = {'endpoint': event['endpoint'], 'cache': event['cache']}
+                add('requests', 'counter', 'Requests made, by endpoint and cache result', labels, 1)
+                add('request_bytes', 'counter', 'Response bytes transferred', labels, event['bytes'])
+                add('request_seconds', 'counter', 'Time spent on the network', labels, event['seconds'])
+                add('request_throttle_seconds', 'counter', 'Time spent waiting for the rate limit', labels, event['throttle_seconds'])
+                add('request_retries', 'counter', 'Retried attempts', labels, event['retries'])
+            elif event['event'] == 'critical_path':
+                add('critical_path_seconds', 'gauge', 'Duration of the longest chain of dependent stages', {'stages': '>'.join(event['stages'])}, event['seconds'])
+            elif event['event'] == 'run':
+                add('run_seconds', 'gauge', 'Duration of the run', {'command': event['command'], 'status': event['status']}, event['seconds'])
+                add('run_timestamp_seconds', 'gauge', 'End of the run', {'command': event['command']}, event['timestamp'])
+
+        lines = []
+        for name, metric in metrics.items():
+            name = f'{METRICS_PREFIX}_{name}'
+            lines.append(f"# TYPE {name} {metric['type']}")
+            lines.append(f"# HELP {name} {metric['help']}")
+            suffix = '_total' if metric['type'] == 'counter' else ''
+            for labels, value in metric['samples'].items():
+                lines.append(f'{name}{suffix}{labels} {value!r}')
+        lines.append('# EOF')
+        write_bytes(self.path, ('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def report(path: str):
+    # Extensão .prom/.txt: OpenMetrics; qualquer outra: JSON lines
+    if os.path.splitext(path)[1] in ('.prom', '.txt'):
+        return OpenMetricsReport(path)
+    return JsonLinesReport(path)
+
+
+class Instrumentation:
+
+    def __init__(self, quiet: bool = False, reports: list = None):
+        self.quiet = quiet
+        self.reports = reports or []
+        self.events = []
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def log(self, message: str):
+        if not self.quiet:
+            print(message)
+
+    def progress(self, iterable=None, **kwargs):
+        return tqdm(iterable, disable=self.quiet, **kwargs)
+
+    def emit(self, event: str, **fields):
+        record = {'event': event, 'timestamp': time.time(), **fields}
+        with self.lock:
+            self.events.append(record)
+            for report in self.reports:
+                report.write(record)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        # O bloco pode preencher info (rows, checkpoint...) para o evento
+        info = {}
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            yield info
+            status = 'ok'
+        finally:
+            self.emit('stage', stage=name, seconds=time.perf_counter() - start, status=status, **info)
+
+    def request(self, endpoint: str, **fields):
+        fields = {'status': None, 'bytes': 0, 'seconds': 0.0, 'throttle_seconds': 0.0, 'retries': 0, 'cache': 'off', **fields}
+        self.emit('request', endpoint=endpoint, **fields)
+
+    def summary(self) -> dict:
+        requests = [event for event in self.events if event['event'] == 'request']
+        return {
+            'requests': sum(event['cache'] != 'hit' for event in requests),
+            'cache_hits': sum(event['cache'] == 'hit' for event in requests),
+            'bytes': sum(event['bytes'] for event in requests),
+            'retries': sum(event['retries'] for event in requests),
+            'failed_requests': sum(event['status'] is None or event['status'] >= 400 for event in requests if event['cache'] != 'hit'),
+            'stages': sum(event['event'] == 'stage' for event in self.events),
+        }
+
+    def close(self, command: str, status: str = 'ok'):
+        self.emit('run', command=command, status=status, seconds=time.perf_counter() - self.started, **self.summary())
+        for report in self.reports:
+            report.close(self.events)
@@ -0,0 +1,133 @@
+"""
+Identity resolution between Ergast and Jolpica entities
+
+Names are folded to a normalized key (accents, case, punctuation and suffixes
+like "Jr." removed) and indexed by a blocking column such as the date of
+birth, the nationality or the country. Rows are matched by the override
+table first, then by exact key, and only then by a bounded fuzzy comparison
+against the unmatched candidates left in the same block, so the cost grows
+with the size of the blocks and not with the product of both sources.
+"""
+import difflib
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+OVERRIDES_PATH = os.path.join(os.path.dirname(__file__), 'overrides.json')
+
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+
+def normalize(text) -> str:
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    words = re.sub(r'[^0-9a-z]+', ' ', text).split()
+    return ' '.join(word for word in words if word not in SUFFIXES)
+
+
+def load_overrides(path: str = OVERRIDES_PATH) -> dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Matcher:
+
+    CUTOFF = 0.85
+    # Diferença mínima entre o melhor e o segundo melhor candidato no fuzzy
+    MARGIN = 0.05
+
+    def __init__(self, kind: str, overrides: dict[str, dict] = None, cutoff: float = CUTOFF, log=print):
+        self.kind = kind
+        self.log = log
+        # Ergast id (como texto) -> id da Jolpica, ou null para forçar que não haja correspondência
+        self.overrides = (load_overrides() if overrides is None else overrides).get(kind, {})
+        self.cutoff = cutoff
+
+    @staticmethod
+    def index(keys: list[str], blocks: list[str], free: set[int]) -> dict[tuple, list[int]]:
+        index = defaultdict(list)
+        for position in sorted(free):
+            index[(blocks[position], keys[position])].append(position)
+        return index
+
+    def pairs(self, left: pd.DataFrame, right: pd.DataFrame, left_id: str, right_id: str,
+              name: str, block: str = None) -> list[tuple[int, int, str]]:
+        left_keys = [normalize(value) for value in left[name]]
+        right_keys = [normalize(value) for value in right[name]]
+        left_blocks = [normalize(value) for value in left[block]] if block is not None else [''] * len(left)
+        right_blocks = [normalize(value) for value in right[block]] if block is not None else [''] * len(right)
+        left_free = set(range(len(left)))
+        right_free = set(range(len(right)))
+        pairs = []
+
+        def take(i: int, j: int, method: str):
+            left_free.discard(i)
+            right_free.discard(j)
+            pairs.append((i, j, method))
+
+        # 1. Tabela de exceções
+        right_positions = {value: position for position, value in enumerate(right[right_id])}
+        for i, value in enumerate(left[left_id]):
+            override = self.overrides.get(str(value), ...)
+            if override is None:
+                left_free.discard(i)
+            elif override is not ... and right_positions.get(override) in right_free:
+                take(i, right_positions[override], 'override')
+
+        # 2. Chave exata dentro do bloco e, se o bloco divergir, chave exata única entre os que sobraram
+        for use_block in [True, False]:
+            right_index = self.index(right_keys, right_blocks if use_block else [''] * len(right), right_free)
+            left_index = self.index(left_keys, left_blocks if use_block else [''] * len(left), left_free)
+            for key, positions in left_index.items():
+                candidates = right_index.get(key, [])
+                if key[1] and len(positions) == 1 and len(candidates) == 1:
+                    take(positions[0], candidates[0], 'exact')
+
+        # 3. Fuzzy só contra os candidatos livres do mesmo bloco, aceitando apenas correspondências mútuas
+        if block is not None:
+            blocks = defaultdict(list)
+            for j in sorted(right_free):
+                blocks[right_blocks[j]].append(j)
+            proposals = defaultdict(list)
+            for i in sorted(left_free):
+                if not left_blocks[i]:
+                    continue
+                scores = sorted(
+                    ((difflib.SequenceMatcher(None, left_keys[i], right_keys[j]).ratio(), j) for j in blocks[left_blocks[i]]),
+                    reverse=True,
+                )
+                if scores and scores[0][0] >= self.cutoff and (len(scores) == 1 or scores[0][0] - scores[1][0] >= self.MARGIN):
+                    proposals[scores[0][1]].append(i)
+            for j, positions in proposals.items():
+                if len(positions) == 1:
+                    i = positions[0]
+                    self.log(f"\t{self.kind}: fuzzy match {left[left_id].iat[i]} '{left[name].iat[i]}' -> {right[right_id].iat[j]} '{right[name].iat[j]}'")
+                    take(i, j, 'fuzzy')
+
+        return pairs
+
+    def match(self, left: pd.DataFrame, right: pd.DataFrame, left_id: str, right_id: str,
+              name: str, block: str = None) -> pd.DataFrame:
+        # Equivalente ao antigo merge outer: pares encontrados mais as linhas sem correspondência de cada lado,
+        # com os valores do lado esquerdo prevalecendo nas colunas em comum
+        left = left.reset_index(drop=True)
+        right = right.reset_index(drop=True)
+        pairs = self.pairs(left, right, left_id, right_id, name, block)
+        left_matched = [i for i, _, _ in pairs]
+        right_matched = [j for _, j, _ in pairs]
+        columns = list(left.columns) + [column for column in right.columns if column not in left.columns]
+
+        matched = left.iloc[left_matched].reset_index(drop=True).combine_first(right.iloc[right_matched].reset_index(drop=True))
+        return pd.concat([
+            matched,
+            left.drop(index=left_matched),
+            right.drop(index=right_matched),
+        ], ignore_index=True)[columns].sort_values(name, kind='stable', ignore_index=True)
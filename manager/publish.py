@@ -0,0 +1,125 @@
+"""
+Versioned release manifest for the published data and images
+
+After every save, release.json lists each published file with its content
+hash, size and the version in which it last changed, so clients and CDNs
+can cache by hash and only revalidate what changed. When anything changes
+the version goes up and deltas/<version>.json describes the step from the
+previous version: files changed and removed and, for the tables, the rows
+added or changed (upsert) and the keys of the rows removed (delete). A
+client holding version N applies deltas N+1, N+2... in order; one older
+than the oldest delta kept reloads the full files.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from manager.files import read_json, write_json
+
+RELEASE = 'release.json'
+DELTAS = 'deltas'
+# Quantos deltas manter; clientes mais antigos baixam tudo de novo
+MAX_DELTAS = 30
+# Versões pré-comprimidas têm o mesmo conteúdo do arquivo puro
+SKIPPED_EXTENSIONS = ('.tmp', '.gz', '.br')
+
+TABLE_KEYS = {
+    'drivers': ['driverId'],
+    'constructors': ['constructorId'],
+    'circuits': ['circuitId'],
+    'races': ['season', 'round'],
+    'constructor_standings': ['season', 'round', 'constructorId'],
+    'driver_standings': ['season', 'round', 'driverId'],
+}
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan(directory: str, exclude: list[str] = ()) -> dict[str, dict]:
+    # Caminhos relativos com '/'; pastas ocultas (checkpoints, caches) e os próprios deltas ficam de fora
+    files = {}
+    for root, folders, names in os.walk(directory):
+        folders[:] = sorted(folder for folder in folders if not folder.startswith('.'))
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, '/')
+            if name.startswith('.') or name.endswith(SKIPPED_EXTENSIONS) or relative == RELEASE \
+                    or relative.startswith(DELTAS + '/') or relative in exclude:
+                continue
+            files[relative] = {'sha256': file_hash(path), 'size': os.path.getsize(path)}
+    return files
+
+
+def table_delta(old: pd.DataFrame, new: pd.DataFrame, keys: list[str]) -> dict:
+    # Linhas novas ou alteradas e chaves removidas; com chaves repetidas o delta é a tabela inteira
+    def rows(df: pd.DataFrame) -> list[dict]:
+        return json.loads(df.to_json(orient='records'))
+
+    if old.duplicated(keys).any() or new.duplicated(keys).any():
+        return {'keys': keys, 'replace': rows(new)}
+    old_rows = {tuple(row[key] for key in keys): row for row in rows(old.reindex(columns=new.columns))}
+    new_rows = {tuple(row[key] for key in keys): row for row in rows(new)}
+    return {
+        'keys': keys,
+        'upsert': [row for key, row in new_rows.items() if old_rows.get(key) != row],
+        'delete': [dict(zip(keys, key)) for key in old_rows if key not in new_rows],
+    }
+
+
+def load_release(directory: str) -> dict:
+    path = os.path.join(directory, RELEASE)
+    if not os.path.exists(path):
+        return {}
+    return read_json(path)
+
+
+def publish(directory: str, tables: dict[str, dict] = None, exclude: list[str] = ()) -> int:
+    # Retorna a versão publicada; sem mudanças, a versão atual é mantida
+    release = load_release(directory)
+    previous = release.get('files', {})
+    files = scan(directory, exclude)
+    changed = sorted(path for path, entry in files.items() if previous.get(path, {}).get('sha256') != entry['sha256'])
+    removed = sorted(set(previous) - set(files))
+    tables = {
+        name: delta for name, delta in (tables or {}).items()
+        if delta.get('replace') is not None or delta['upsert'] or delta['delete']
+    }
+    if release and not changed and not removed and not tables:
+        return release['version']
+
+    version = release.get('version', 0) + 1
+    for path, entry in files.items():
+        entry['version'] = version if path in changed else previous[path]['version']
+
+    folder = os.path.join(directory, DELTAS)
+    deltas = [delta for delta in release.get('deltas', []) if os.path.exists(os.path.join(folder, f'{delta}.json'))]
+    if release:
+        os.makedirs(folder, exist_ok=True)
+        write_json(os.path.join(folder, f'{version}.json'), {
+            'from': version - 1,
+            'to': version,
+            'changed': changed,
+            'removed': removed,
+            'tables': tables,
+        })
+        deltas.append(version)
+    for delta in deltas[:-MAX_DELTAS]:
+        os.remove(os.path.join(folder, f'{delta}.json'))
+    deltas = deltas[-MAX_DELTAS:]
+
+    write_json(os.path.join(directory, RELEASE), {
+        'version': version,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'deltas': deltas,
+        'files': files,
+    })
+    return version
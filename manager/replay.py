@@ -0,0 +1,593 @@
+"""
+Record/replay of HTTP traffic and a local stand-in for the external services
+
+- RecordingAdapter and ReplayAdapter are requests transport adapters. Mounted
+  on a Session, they save every response to a fixtures folder, or answer from
+  it without touching the network.
+- StandInServer is a local HTTP server that impersonates api.jolpi.ca (MRData
+  pagination, per-round standings, results), the Ergast f1db_csv.zip and the
+  Wikipedia/seeklogo pages and images. Everything is synthesized from a data
+  folder such as static/data, or served from recorded fixtures. Latency and
+  429/503 errors can be injected with a fixed seed, so throughput and retry
+  behavior can be measured repeatably.
+- RouteAdapter sends every request of a Session to the stand-in, keeping the
+  original host as the first path segment.
+
+Usage: python -m manager.replay [data folder] [--port 8000] [--latency 0.05] [--error-rate 0.05]
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from manager.files import read_json, write_json
+
+JOLPICA_HOST = 'api.jolpi.ca'
+ERGAST_HOST = 'ergast.com'
+WIKIPEDIA_HOST = 'en.wikipedia.org'
+SEEKLOGO_HOST = 'seeklogo.com'
+IMAGES_HOSTS = {'upload.wikimedia.org', 'images.seeklogo.com'}
+
+# Como a Jolpica: 30 itens por página por padrão e no máximo 100
+DEFAULT_LIMIT = 30
+MAX_LIMIT = 100
+ERGAST_LAST_SEASON = 2020
+# Cabeçalhos que deixam de valer depois que o corpo é decodificado pelo requests
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+# --------------------------------------------------------------------------- #
+# Record / replay
+# --------------------------------------------------------------------------- #
+def fixture_key(method: str, url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query)))
+    return hashlib.sha256(f'{method} {parts.netloc}{parts.path}?{query}'.encode()).hexdigest()[:24]
+
+
+def mount(session: requests.Session, adapter: BaseAdapter) -> requests.Session:
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class RecordingAdapter(HTTPAdapter):
+
+    def __init__(self, folder: str, **kwargs):
+        super().__init__(**kwargs)
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        key = fixture_key(request.method, request.url)
+        fixture = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS},
+            'body': base64.b64encode(response.content).decode(),
+        }
+        write_json(os.path.join(self.folder, f'{key}.json'), fixture, indent=1)
+        return response
+
+
+def load_fixture(folder: str, method: str, url: str) -> dict | None:
+    path = os.path.join(folder, f'{fixture_key(method, url)}.json')
+    if not os.path.exists(path):
+        return None
+    fixture = read_json(path)
+    fixture['body'] = base64.b64decode(fixture['body'])
+    return fixture
+
+
+class ReplayAdapter(BaseAdapter):
+
+    def __init__(self, folder: str):
+        super().__init__()
+        self.folder = folder
+
+    def send(self, request, **kwargs):
+        fixture = load_fixture(self.folder, request.method, request.url)
+        if fixture is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}", request=request)
+        response = requests.Response()
+        response.status_code = fixture['status']
+        response.reason = fixture['reason']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = fixture['body']
+        response._content_consumed = True
+        response.raw = io.BytesIO(fixture['body'])
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class RouteAdapter(HTTPAdapter):
+
+    # https://api.jolpi.ca/ergast/f1/... -> http://127.0.0.1:<port>/api.jolpi.ca/ergast/f1/...
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, request, **kwargs):
+        if request.url.startswith(self.base_url + '/'):
+            return super().send(request, **kwargs)
+        parts = urlsplit(request.url)
+        request = request.copy()
+        request.url = f'{self.base_url}/{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+# --------------------------------------------------------------------------- #
+# Synthesized responses
+# --------------------------------------------------------------------------- #
+def na(value):
+    return None if pd.isna(value) else value
+
+
+class StandInData:
+
+    def __init__(self, data_folder: str, ergast_last_season: int = ERGAST_LAST_SEASON):
+        self.ergast_last_season = ergast_last_season
+        self.drivers = pd.read_csv(os.path.join(data_folder, 'drivers.csv'))
+        self.constructors = pd.read_csv(os.path.join(data_folder, 'constructors.csv'))
+        self.circuits = pd.read_csv(os.path.join(data_folder, 'circuits.csv'))
+        self.races = pd.read_csv(os.path.join(data_folder, 'races.csv'))
+        self.driver_standings = pd.read_csv(os.path.join(data_folder, 'driver_standings.csv'))
+        self.constructor_standings = pd.read_csv(os.path.join(data_folder, 'constructor_standings.csv'))
+        self.lock = threading.Lock()
+        self.memo = {}
+
+    def memoized(self, key, build):
+        with self.lock:
+            if key not in self.memo:
+                self.memo[key] = build()
+            return self.memo[key]
+
+    # ---- Jolpica ---- #
+    @staticmethod
+    def page(rows: list, url: str, params: dict, table: str, key: str, extra: dict = None, group=None) -> dict:
+        limit = min(int(params.get('limit') or DEFAULT_LIMIT), MAX_LIMIT)
+        offset = int(params.get('offset') or 0)
+        items = rows[offset:offset + limit]
+        if group is not None:
+            items = group(items)
+        return {'MRData': {
+            'xmlns': '',
+            'series': 'f1',
+            'url': url,
+            'limit': str(limit),
+            'offset': str(offset),
+            'total': str(len(rows)),
+            table: {**(extra or {}), key: items},
+        }}
+
+    def driver_json(self, driver) -> dict:
+        return {k: v for k, v in {
+            'driverId': driver.driverId,
+            'code': na(driver.code),
+            'url': na(driver.url),
+            'givenName': driver.givenName,
+            'familyName': driver.familyName,
+            'dateOfBirth': na(driver.dateOfBirth),
+            'nationality': na(driver.nationality),
+        }.items() if v is not None}
+
+    def constructor_json(self, constructor) -> dict:
+        return {
+            'constructorId': constructor.constructorId,
+            'url': na(constructor.url),
+            'name': constructor.name,
+            'nationality': na(constructor.nationality),
+        }
+
+    def circuit_json(self, circuit) -> dict:
+        return {
+            'circuitId': circuit.circuitId,
+            'url': na(circuit.url),
+            'circuitName': circuit.circuitName,
+            'Location': {'lat': str(circuit.lat), 'long': str(circuit.long), 'locality': circuit.locality, 'country': circuit.country},
+        }
+
+    def standings_round(self, standings: pd.DataFrame, season: int, round: int | None) -> tuple[pd.DataFrame, int | None]:
+        standings = standings[standings.season == season]
+        if standings.empty:
+            return standings, None
+        round = round or int(standings['round'].max())
+        return standings[standings['round'] == round].sort_values('position'), round
+
+    def results(self, season: int) -> list[tuple[int, dict]]:
+        # Resultados coerentes com a classificação: pontos e vitórias de cada rodada saem da diferença entre rodadas
+        def build():
+            standings = self.driver_standings[self.driver_standings.season == season].sort_values(['round', 'position'])
+            previous = standings.groupby('driverId')[['points', 'wins']].shift(fill_value=0)
+            standings = standings.assign(delta_points=standings.points - previous.points, delta_wins=standings.wins - previous.wins)
+            rows = []
+            for round, group in standings.groupby('round'):
+                group = group.sort_values(['delta_wins', 'delta_points', 'position'], ascending=[False, False, True])
+                rows += [
+                    (int(round), {
+                        'number': '0',
+                        'position': str(position),
+                        'positionText': str(position),
+                        'points': f'{row.delta_points:g}',
+                        'Driver': {'driverId': row.driverId},
+                        'Constructor': {'constructorId': row.constructorId},
+                    })
+                    for position, row in enumerate(group.itertuples(), start=1)
+                ]
+            return rows
+        return self.memoized(('results', season), build)
+
+    def jolpica(self, path: str, url: str, params: dict) -> dict | None:
+        parts = [part for part in path.split('/') if part]
+        if parts[:2] != ['ergast', 'f1'] or len(parts) < 3 or not parts[-1].endswith('.json'):
+            return None
+        endpoint = parts[-1][:-len('.json')]
+        filters = [int(part) for part in parts[2:-1] if part.isdigit()]
+        season = filters[0] if filters else None
+        round = filters[1] if len(filters) > 1 else None
+        extra = {k: str(v) for k, v in {'season': season, 'round': round}.items() if v is not None}
+
+        if endpoint == 'drivers':
+            drivers = self.drivers
+            if season is not None:
+                standings = self.driver_standings[self.driver_standings.season == season]
+                if round is not None:
+                    standings = standings[standings['round'] == round]
+                drivers = drivers[drivers.driverId.isin(standings.driverId)]
+            rows = [self.driver_json(driver) for driver in drivers.sort_values('driverId').itertuples()]
+            return self.page(rows, url, params, 'DriverTable', 'Drivers', extra)
+
+        if endpoint == 'constructors':
+            constructors = self.constructors
+            if season is not None:
+                standings = self.constructor_standings[self.constructor_standings.season == season]
+                if round is not None:
+                    standings = standings[standings['round'] == round]
+                constructors = constructors[constructors.constructorId.isin(standings.constructorId)]
+            rows = [self.constructor_json(constructor) for constructor in constructors.sort_values('constructorId').itertuples()]
+            return self.page(rows, url, params, 'ConstructorTable', 'Constructors', extra)
+
+        if endpoint == 'circuits':
+            circuits = self.circuits
+            if season is not None:
+                races = self.races[self.races.season == season]
+                if round is not None:
+                    races = races[races['round'] == round]
+                circuits = circuits[circuits.circuitId.isin(races.circuitId)]
+            rows = [self.circuit_json(circuit) for circuit in circuits.sort_values('circuitId').itertuples()]
+            return self.page(rows, url, params, 'CircuitTable', 'Circuits', extra)
+
+        if endpoint == 'races':
+            races = self.races if season is None else self.races[self.races.season == season]
+            if round is not None:
+                races = races[races['round'] == round]
+            circuits = {circuit.circuitId: self.circuit_json(circuit) for circuit in self.circuits.itertuples()}
+            rows = [
+                {
+                    'season': str(race.season),
+                    'round': str(race.round),
+                    'url': na(race.url),
+                    'raceName': race.raceName,
+                    'Circuit': circuits.get(race.circuitId, {'circuitId': race.circuitId}),
+                    'date': race.date,
+                }
+                for race in races.sort_values(['season', 'round']).itertuples()
+            ]
+            return self.page(rows, url, params, 'RaceTable', 'Races', extra)
+
+        if endpoint in ('driverstandings', 'constructorstandings') and season is not None:
+            drivers = endpoint == 'driverstandings'
+            standings, round = self.standings_round(self.driver_standings if drivers else self.constructor_standings, season, round)
+            rows = []
+            for standing in standings.itertuples():
+                row = {'position': str(int(standing.position))} if not pd.isna(standing.position) else {}
+                row.update({'points': f'{standing.points:g}', 'wins': str(int(standing.wins))})
+                if drivers:
+                    row['Driver'] = {'driverId': standing.driverId}
+                    row['Constructors'] = [{'constructorId': standing.constructorId}]
+                else:
+                    row['Constructor'] = {'constructorId': standing.constructorId}
+                rows.append(row)
+            key = 'DriverStandings' if drivers else 'ConstructorStandings'
+            extra = {'season': str(season), 'round': str(round)} if round is not None else {'season': str(season)}
+            return self.page(
+                rows, url, params, 'StandingsTable', 'StandingsLists', extra,
+                group=lambda items: [{**extra, key: items}] if round is not None else [],
+            )
+
+        if endpoint in ('results', 'sprint') and season is not None:
+            # Os dados só têm a classificação: toda a pontuação vai para a corrida e não há sprints
+            rows = self.results(season) if endpoint == 'results' else []
+            if round is not None:
+                rows = [row for row in rows if row[0] == round]
+            key = 'Results' if endpoint == 'results' else 'SprintResults'
+
+            def group(items):
+                races = {}
+                for race_round, result in items:
+                    races.setdefault(race_round, {'season': str(season), 'round': str(race_round), key: []})[key].append(result)
+                return list(races.values())
+            return self.page(rows, url, params, 'RaceTable', 'Races', extra, group=group)
+
+        return None
+
+    # ---- Ergast ---- #
+    def ergast_archive(self) -> bytes:
+        def build():
+            last = self.ergast_last_season
+            drivers = self.drivers.dropna(subset=['driverIdErgast'])
+            constructors = self.constructors.dropna(subset=['constructorIdErgast'])
+            circuits = self.circuits.dropna(subset=['circuitIdErgast'])
+            races = self.races.dropna(subset=['raceIdErgast'])
+            races = races[races.season <= last]
+            circuit_ids = circuits.set_index('circuitId').circuitIdErgast.astype(int)
+            race_ids = races.set_index(['season', 'round']).raceIdErgast.astype(int)
+
+            tables = {
+                'drivers': pd.DataFrame({
+                    'driverId': drivers.driverIdErgast.astype(int), 'driverRef': drivers.driverId, 'number': r'\N',
+                    'code': drivers.code.fillna(r'\N'), 'forename': drivers.givenName, 'surname': drivers.familyName,
+                    'dob': drivers.dateOfBirth, 'nationality': drivers.nationality, 'url': drivers.url,
+                }),
+                'constructors': pd.DataFrame({
+                    'constructorId': constructors.constructorIdErgast.astype(int), 'constructorRef': constructors.constructorId,
+                    'name': constructors['name'], 'nationality': constructors.nationality, 'url': constructors.url,
+                }),
+                'circuits': pd.DataFrame({
+                    'circuitId': circuits.circuitIdErgast.astype(int), 'circuitRef': circuits.circuitId, 'name': circuits.circuitName,
+                    'location': circuits.locality, 'country': circuits.country, 'lat': circuits.lat, 'lng': circuits.long,
+                    'alt': r'\N', 'url': circuits.url,
+                }),
+                'races': pd.DataFrame({
+                    'raceId': races.raceIdErgast.astype(int), 'year': races.season, 'round': races['round'],
+                    'circuitId': races.circuitId.map(circuit_ids), 'name': races.raceName, 'date': races.date,
+                    'time': r'\N', 'url': races.url,
+                }),
+            }
+            for name, id_column, entity, ids in [
+                ('driver_standings', 'driverStandingsId', 'driverId', drivers.set_index('driverId').driverIdErgast.astype(int)),
+                ('constructor_standings', 'constructorStandingsId', 'constructorId', constructors.set_index('constructorId').constructorIdErgast.astype(int)),
+            ]:
+                standings = getattr(self, name)
+                standings = standings[(standings.season <= last) & standings[entity].isin(ids.index)]
+                standings = standings[pd.MultiIndex.from_frame(standings[['season', 'round']]).isin(race_ids.index)]
+                tables[name] = pd.DataFrame({
+                    id_column: range(1, len(standings) + 1),
+                    'raceId': [race_ids[key] for key in zip(standings.season, standings['round'])],
+                    entity: standings[entity].map(ids),
+                    'points': standings.points,
+                    'position': standings.position,
+                    'positionText': standings.position.map(lambda x: r'\N' if pd.isna(x) else str(int(x))),
+                    'wins': standings.wins,
+                })
+            # Tabela grande que o create() não usa, como no arquivo original
+            tables['lap_times'] = pd.DataFrame({'raceId': [], 'driverId': [], 'lap': [], 'position': [], 'time': [], 'milliseconds': []})
+
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name, table in tables.items():
+                    archive.writestr(f'{name}.csv', table.to_csv(index=False))
+            return buffer.getvalue()
+        return self.memoized('ergast', build)
+
+    # ---- Images ---- #
+    @staticmethod
+    def slug(text: str) -> str:
+        return ''.join(char if char.isalnum() else '_' for char in text)
+
+    def driver_page(self, name: str) -> str:
+        return (
+            '<html><body><table class="infobox"><tr><td class="infobox-image">'
+            f'<img src="//upload.wikimedia.org/stand-in/{self.slug(name)}.jpg"></td></tr></table></body></html>'
+        )
+
+    def logo_page(self, query: str) -> str:
+        return (
+            '<html><body><ul class="logoGroupCt"><li>'
+            f'<img class="logoImage" src="https://images.seeklogo.com/stand-in/{self.slug(query)}.png"></li></ul></body></html>'
+        )
+
+    def image(self, name: str) -> bytes:
+        def build():
+            from PIL import Image
+            stem, extension = os.path.splitext(name)
+            color = tuple(hashlib.sha256(stem.encode()).digest()[:3])
+            size = (640, 480) if extension == '.jpg' else (400, 400)
+            buffer = io.BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'JPEG' if extension == '.jpg' else 'PNG')
+            return buffer.getvalue()
+        return self.memoized(('image', name), build)
+
+
+# --------------------------------------------------------------------------- #
+# Server
+# --------------------------------------------------------------------------- #
+class StandInServer:
+
+    def __init__(self, data_folder: str = 'static/data', host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 fixtures: str = None, ergast_last_season: int = ERGAST_LAST_SEASON):
+        self.data = StandInData(data_folder, ergast_last_season)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.fixtures = fixtures
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def jolpica_url(self) -> str:
+        return f'{self.url}/{JOLPICA_HOST}/ergast/f1'
+
+    @property
+    def ergast_url(self) -> str:
+        return f'{self.url}/{ERGAST_HOST}/downloads/f1db_csv.zip'
+
+    def session(self, pool_size: int = 10) -> requests.Session:
+        # Session que manda qualquer host para o servidor local
+        return mount(requests.Session(), RouteAdapter(self.url, pool_maxsize=pool_size))
+
+    def start(self) -> 'StandInServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def inject(self) -> tuple[float, int | None]:
+        # Sorteia o atraso e, com probabilidade error_rate, um 429 ou 503
+        with self.lock:
+            delay = self.latency + self.jitter * self.random.random()
+            error = None
+            if self.random.random() < self.error_rate:
+                error = self.random.choice([429, 503])
+        return delay, error
+
+    def route(self, host: str, path: str, query: dict, headers) -> tuple[int, dict, bytes]:
+        if self.fixtures is not None:
+            url = f'https://{host}{path}' + (f'?{urlencode(query)}' if query else '')
+            fixture = load_fixture(self.fixtures, 'GET', url)
+            if fixture is not None:
+                return fixture['status'], fixture['headers'], fixture['body']
+
+        if host == JOLPICA_HOST:
+            data = self.data.jolpica(path, f'https://{host}{path}', query)
+            if data is not None:
+                return 200, {'Content-Type': 'application/json'}, json.dumps(data).encode()
+        elif host == ERGAST_HOST and path.endswith('/f1db_csv.zip'):
+            return self.ranged(self.data.ergast_archive(), headers)
+        elif host == WIKIPEDIA_HOST and path.startswith('/wiki/'):
+            return self.conditional(self.data.driver_page(path.rsplit('/', 1)[-1]).encode(), 'text/html; charset=utf-8', headers)
+        elif host == SEEKLOGO_HOST and 'q' in query:
+            return self.conditional(self.data.logo_page(query['q']).encode(), 'text/html; charset=utf-8', headers)
+        elif host in IMAGES_HOSTS:
+            name = path.rsplit('/', 1)[-1]
+            return self.conditional(self.data.image(name), 'image/jpeg' if name.endswith('.jpg') else 'image/png', headers)
+        return 404, {'Content-Type': 'text/plain'}, b'Not found'
+
+    @staticmethod
+    def conditional(body: bytes, content_type: str, headers) -> tuple[int, dict, bytes]:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        return 200, {'Content-Type': content_type, 'ETag': etag}, body
+
+    @staticmethod
+    def ranged(body: bytes, headers) -> tuple[int, dict, bytes]:
+        range_header = headers.get('Range', '')
+        if not range_header.startswith('bytes='):
+            return 200, {'Content-Type': 'application/zip', 'Accept-Ranges': 'bytes'}, body
+        start = int(range_header[len('bytes='):].split('-')[0] or 0)
+        if start >= len(body):
+            return 416, {'Content-Range': f'bytes */{len(body)}'}, b''
+        return 206, {'Content-Type': 'application/zip', 'Content-Range': f'bytes {start}-{len(body) - 1}/{len(body)}'}, body[start:]
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            # Cabeçalho e corpo saem em escritas separadas: sem isso o Nagle soma ~40 ms por resposta
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                segments = parts.path.lstrip('/').split('/', 1)
+                # Com RouteAdapter o host original vem no primeiro segmento
+                if '.' in segments[0]:
+                    host, path = segments[0], '/' + (segments[1] if len(segments) > 1 else '')
+                else:
+                    host, path = JOLPICA_HOST, parts.path
+                query = dict(parse_qsl(parts.query))
+
+                delay, error = server.inject()
+                time.sleep(delay)
+                with server.lock:
+                    server.stats[host] += 1
+                    if error is not None:
+                        server.stats[f'error {error}'] += 1
+                if error is not None:
+                    status, headers, body = error, {'Retry-After': '0', 'Content-Type': 'text/plain'}, b'Injected error'
+                else:
+                    status, headers, body = server.route(host, path, query, self.headers)
+
+                self.send_response(status)
+                for key, value in headers.items():
+                    if key.lower() not in DROPPED_HEADERS:
+                        self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m manager.replay', description='Serve a local stand-in for the Jolpica API, the Ergast archive and the image sources')
+    parser.add_argument('data_folder', nargs='?', default='static/data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra seconds, up to this value')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 429/503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', help='Folder of recorded responses served before the synthesized ones')
+    parser.add_argument('--ergast-last-season', type=int, default=ERGAST_LAST_SEASON, help='Last season included in the Ergast archive')
+    args = parser.parse_args()
+
+    server = StandInServer(
+        args.data_folder, args.host, args.port,
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+        fixtures=args.fixtures, ergast_last_season=args.ergast_last_season,
+    )
+    print(f"Serving on {server.url}")
+    print(f"\t--jolpica-url {server.jolpica_url}")
+    print(f"\t--ergast-url {server.ergast_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,78 @@
+"""
+Dependency-ordered execution of build stages
+
+Stages are declared with the names of the stages whose results they take as
+inputs, in an order where every input is declared before the stages that use
+it. The scheduler starts each stage as soon as its inputs are done, so
+independent stages (the entity tables, each waiting on its own API
+pagination) overlap. After a run it reports the critical path: the chain of
+dependent stages with the longest total duration, which bounds the build no
+matter how many stages run at once.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Scheduler:
+
+    def __init__(self, workers: int = None):
+        self.workers = workers
+        self.stages = {}
+        self.seconds = {}
+        self.elapsed = 0.0
+
+    def add(self, name: str, build, *inputs: str):
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already declared")
+        unknown = [input for input in inputs if input not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on undeclared stages {unknown}")
+        self.stages[name] = (build, inputs)
+
+    def __timed(self, name: str, execute, build, inputs: tuple[str], values: list):
+        start = time.perf_counter()
+        try:
+            return execute(name, lambda: build(*values), *inputs)
+        finally:
+            self.seconds[name] = time.perf_counter() - start
+
+    def run(self, execute=None) -> dict:
+        # execute(name, build, *inputs) envolve cada etapa (checkpoints, instrumentação); por padrão só chama build()
+        execute = execute or (lambda name, build, *inputs: build())
+        start = time.perf_counter()
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        # Uma falha interrompe o agendamento; as etapas já em execução terminam antes da exceção subir
+        with ThreadPoolExecutor(max_workers=self.workers or max(len(self.stages), 1)) as executor:
+            while pending or running:
+                for name, (build, inputs) in list(pending.items()):
+                    if all(input in results for input in inputs):
+                        del pending[name]
+                        values = [results[input] for input in inputs]
+                        running[executor.submit(self.__timed, name, execute, build, inputs, values)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    def critical_path(self) -> tuple[list[str], float]:
+        # Maior soma de durações de uma cadeia de dependências; a declaração já está em ordem topológica
+        finish = {}
+        previous = {}
+        for name, (_, inputs) in self.stages.items():
+            if name not in self.seconds:
+                continue
+            before = max((input for input in inputs if input in finish), key=finish.get, default=None)
+            finish[name] = self.seconds[name] + (finish[before] if before is not None else 0.0)
+            previous[name] = before
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        seconds = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], seconds
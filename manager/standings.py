@@ -0,0 +1,138 @@
+"""
+Standings computed from race results
+
+The standings endpoints answer one round per request, while a whole season
+of race and sprint results fits in a handful of pages. The engine fetches
+each season's results once and derives the standings of every round:
+
+- points are the ones the API awarded to each result, so every season's
+  points system (half points, fastest lap, sprints) is already applied
+- wins count Grand Prix victories only
+- ties are broken by countback: most wins, then most second places, etc.,
+  counting classified finishes only (retirements, disqualifications and
+  other unclassified results do not count as places)
+
+The computed final round of each season is checked against the API
+standings (points, wins and positions), and seasons that disagree
+(penalties, exclusions) are left to the per-round endpoints. A tie broken
+differently mid-season does not show in the final round, so every round of
+the last seasons that passed is also compared with the per-round endpoints;
+if any position differs there, no computed season is used.
+"""
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 100
+FIRST_SPRINT_SEASON = 2021
+# Posições de chegada consideradas no desempate
+COUNTBACK = 30
+# Temporadas calculadas conferidas rodada a rodada com a API
+SPOT_CHECKS = 1
+
+RESULTS_COLUMNS = ['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'positionText', 'sprint']
+RESULTS_DTYPES = {'season': 'int64', 'round': 'int64', 'points': 'float64', 'position': 'int64', 'positionText': 'object', 'sprint': 'bool'}
+
+
+def results_records(response: dict, sprint: bool) -> list[dict]:
+    key = 'SprintResults' if sprint else 'Results'
+    return [
+        {
+            'season': int(race['season']),
+            'round': int(race['round']),
+            'driverId': result['Driver']['driverId'],
+            'constructorId': result['Constructor']['constructorId'],
+            'points': float(result['points']),
+            'position': int(result['position']),
+            'positionText': result['positionText'],
+            'sprint': sprint,
+        }
+        for race in response['MRData']['RaceTable']['Races']
+        for result in race.get(key, [])
+    ]
+
+
+def compute(results: pd.DataFrame, entity: str) -> pd.DataFrame:
+    keys = ['season', 'round', entity]
+    places = [f'p{place}' for place in range(1, COUNTBACK + 1)]
+
+    # Pontos de corrida e sprint; contagem de posições só das corridas, e só de quem foi classificado
+    # (positionText R, D, W, E, N... tem posição, mas não conta no desempate)
+    counted = ~results['sprint'] & results['positionText'].astype(str).str.isdigit()
+    position = results['position'].clip(upper=COUNTBACK)
+    table = pd.DataFrame(
+        np.equal.outer(position.where(counted, 0).to_numpy(), np.arange(1, COUNTBACK + 1)).astype('int64'),
+        columns=places,
+        index=results.index,
+    )
+    table = pd.concat([results[keys + ['points']], table], axis=1).groupby(keys, as_index=False).sum()
+
+    # Cada entidade aparece em todas as rodadas a partir da primeira em que correu
+    rounds = results[['season', 'round']].drop_duplicates()
+    first = results.groupby(['season', entity], as_index=False)['round'].min().rename(columns={'round': 'first'})
+    grid = rounds.merge(first, on='season')
+    grid = grid[grid['round'] >= grid['first']].drop(columns='first')
+    grid = grid.merge(table, on=keys, how='left').fillna({column: 0 for column in ['points'] + places})
+    grid = grid.sort_values(keys, kind='stable')
+    grid[['points'] + places] = grid.groupby(['season', entity])[['points'] + places].cumsum()
+
+    grid = grid.sort_values(['season', 'round', 'points'] + places, ascending=[True, True, False] + [False] * COUNTBACK, kind='stable')
+    grid['position'] = grid.groupby(['season', 'round']).cumcount() + 1
+    grid['wins'] = grid['p1'].astype('int64')
+    return grid[keys + ['points', 'position', 'wins']].reset_index(drop=True)
+
+
+def disagreements(computed: pd.DataFrame, oracle: pd.DataFrame, entity: str) -> set[int]:
+    # Temporadas em que alguma rodada calculada difere da classificação da API nas rodadas que ela traz
+    keys = ['season', 'round', entity]
+    oracle = oracle[keys + ['points', 'position', 'wins']]
+    rounds = oracle[['season', 'round']].drop_duplicates()
+    both = computed.merge(rounds, on=['season', 'round']).merge(oracle, on=keys, how='outer', suffixes=('', '_api'))
+    equal = (
+        np.isclose(both['points'].astype(float), both['points_api'].astype(float))
+        & (both['wins'] == both['wins_api']).fillna(False)
+        & ((both['position'] == both['position_api']).fillna(False) | both['position_api'].isna())
+    )
+    wrong = set(both.loc[~equal, 'season'].astype(int))
+    # Temporadas sem resultados até a rodada da API também não podem ser usadas
+    missing = set(oracle['season'].astype(int)) - set(computed.merge(rounds, on=['season', 'round'])['season'].astype(int))
+    return wrong | missing
+
+
+class StandingsEngine:
+
+    def __init__(self, jolpica, workers: int = 1):
+        self.jolpica = jolpica
+        self.workers = workers
+        self.cache = {}
+
+    def fetch(self, method, seasons: list[int], sprint: bool) -> list[dict]:
+        # Primeira página de cada temporada e, depois, todas as páginas restantes de uma vez
+        first = self.jolpica.fetch_many(method, [{'season': season} for season in seasons], workers=self.workers)
+        calls = [
+            {'season': season, 'offset': offset}
+            for season, response in zip(seasons, first)
+            for offset in range(PAGE_SIZE, int(response['MRData']['total']), PAGE_SIZE)
+        ]
+        rest = self.jolpica.fetch_many(method, calls, workers=self.workers)
+        return [record for response in first + rest for record in results_records(response, sprint)]
+
+    def results(self, seasons: list[int]) -> pd.DataFrame:
+        new = sorted(set(seasons) - set(self.cache))
+        if new:
+            records = self.fetch(self.jolpica.results, new, sprint=False)
+            records += self.fetch(self.jolpica.sprint, [season for season in new if season >= FIRST_SPRINT_SEASON], sprint=True)
+            results = pd.DataFrame(records, columns=RESULTS_COLUMNS).astype(RESULTS_DTYPES)
+            for season in new:
+                self.cache[season] = results[results.season == season]
+        return pd.concat([self.cache[season] for season in seasons], ignore_index=True)
+
+    def constructor_standings(self, seasons: list[int]) -> pd.DataFrame:
+        return compute(self.results(seasons), 'constructorId')
+
+    def driver_standings(self, seasons: list[int]) -> pd.DataFrame:
+        results = self.results(seasons)
+        standings = compute(results, 'driverId')
+        # Como na API, a equipe do piloto é a primeira com que correu na temporada
+        first_constructor = results.sort_values(['season', 'round'], kind='stable').drop_duplicates(['season', 'driverId'])
+        standings = standings.merge(first_constructor[['season', 'driverId', 'constructorId']], on=['season', 'driverId'], how='left')
+        return standings[['season', 'round', 'driverId', 'constructorId', 'points', 'position', 'wins']]
@@ -0,0 +1,230 @@
+"""
+Storage backends for the database tables
+
+CSV is what the Svelte app reads; Parquet and Feather keep the dtypes and
+are compressed, for analysis. Parquet is written in small row groups sorted
+by season, so loading a few seasons only decodes the matching row groups.
+The compact format is a CSV for the app with the entity ids replaced by
+integer codes from a shared dictionary, written next to gzip (and brotli,
+when installed) copies for servers that send pre-compressed files.
+"""
+import gzip
+import json
+import os
+
+import pandas as pd
+
+from manager.files import read_json, replacing, write_bytes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SCHEMAS = {
+    'drivers': {
+        'driverIdErgast': 'Int64',
+        'driverId': 'string',
+        'code': 'string',
+        'givenName': 'string',
+        'familyName': 'string',
+        'dateOfBirth': 'string',
+        'nationality': 'string',
+        'url': 'string',
+    },
+    'constructors': {
+        'constructorIdErgast': 'Int64',
+        'name': 'string',
+        'constructorId': 'string',
+        'url': 'string',
+        'nationality': 'string',
+    },
+    'circuits': {
+        'circuitIdErgast': 'Int64',
+        'circuitName': 'string',
+        'locality': 'string',
+        'country': 'string',
+        'lat': 'float64',
+        'long': 'float64',
+        'url': 'string',
+        'circuitId': 'string',
+    },
+    'races': {
+        'raceIdErgast': 'Int64',
+        'season': 'int64',
+        'round': 'int64',
+        'circuitId': 'string',
+        'raceName': 'string',
+        'date': 'string',
+        'url': 'string',
+    },
+    'constructor_standings': {
+        'season': 'int64',
+        'round': 'int64',
+        'constructorId': 'string',
+        'points': 'float64',
+        'position': 'Int64',
+        'wins': 'int64',
+    },
+    'driver_standings': {
+        'season': 'int64',
+        'round': 'int64',
+        'driverId': 'string',
+        'constructorId': 'string',
+        'points': 'float64',
+        'position': 'Int64',
+        'wins': 'int64',
+    },
+}
+
+
+def apply_schema(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    schema = SCHEMAS.get(name, {})
+    return df.astype({column: dtype for column, dtype in schema.items() if column in df.columns})
+
+
+class Storage:
+
+    extension = None
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}{self.extension}')
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def save(self, name: str, df: pd.DataFrame):
+        raise NotImplementedError
+
+    def load(self, name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @staticmethod
+    def _columns(columns: list[str], seasons: list[int]) -> list[str]:
+        # A coluna season é necessária para o filtro, mesmo que não tenha sido pedida
+        if columns is not None and seasons is not None and 'season' not in columns:
+            return list(columns) + ['season']
+        return columns
+
+    @staticmethod
+    def _filter(df: pd.DataFrame, columns: list[str], seasons: list[int]) -> pd.DataFrame:
+        if seasons is not None and 'season' in df.columns:
+            df = df[df['season'].isin(seasons)]
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+
+
+class CsvStorage(Storage):
+
+    extension = '.csv'
+    CHUNK_SIZE = 10_000
+
+    def save(self, name: str, df: pd.DataFrame):
+        with replacing(self.path(name)) as temporary:
+            df.to_csv(temporary, index=False)
+
+    def load(self, name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        usecols = self._columns(columns, seasons)
+        if seasons is None:
+            df = pd.read_csv(self.path(name), usecols=usecols)
+        else:
+            # Texto não tem índice: lê em blocos e descarta o que não é das temporadas pedidas
+            chunks = pd.read_csv(self.path(name), usecols=usecols, chunksize=self.CHUNK_SIZE)
+            df = pd.concat([chunk[chunk['season'].isin(seasons)] if 'season' in chunk.columns else chunk for chunk in chunks])
+        return self._filter(apply_schema(name, df), columns, seasons)
+
+
+class ParquetStorage(Storage):
+
+    extension = '.parquet'
+    ROW_GROUP_SIZE = 2_000
+
+    def save(self, name: str, df: pd.DataFrame):
+        if 'season' in df.columns:
+            df = df.sort_values('season', kind='stable')
+        with replacing(self.path(name)) as temporary:
+            df.to_parquet(temporary, index=False, compression='zstd', row_group_size=self.ROW_GROUP_SIZE)
+
+    def load(self, name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        filters = None
+        if seasons is not None and 'season' in SCHEMAS.get(name, {}):
+            filters = [('season', 'in', list(seasons))]
+        df = pd.read_parquet(self.path(name), columns=self._columns(columns, seasons), filters=filters)
+        return self._filter(apply_schema(name, df), columns, seasons)
+
+
+class FeatherStorage(Storage):
+
+    extension = '.feather'
+
+    def save(self, name: str, df: pd.DataFrame):
+        with replacing(self.path(name)) as temporary:
+            df.reset_index(drop=True).to_feather(temporary, compression='zstd')
+
+    def load(self, name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        df = pd.read_feather(self.path(name), columns=self._columns(columns, seasons))
+        return self._filter(apply_schema(name, df), columns, seasons)
+
+
+def write_compressed(path: str, content: bytes):
+    # Arquivo puro mais as versões .gz/.br; mtime=0 deixa o gzip igual byte a byte entre execuções
+    variants = {path: content, path + '.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[path + '.br'] = brotli.compress(content, quality=11)
+    for variant, data in variants.items():
+        write_bytes(variant, data)
+
+
+class CompactStorage(Storage):
+
+    extension = '.compact.csv'
+    DICTIONARY = 'dictionary.json'
+    # Colunas de ids trocadas por códigos inteiros
+    ENCODED = ['driverId', 'constructorId', 'circuitId']
+    # Suficiente para pontos e coordenadas sem perda, sem o '.0' dos inteiros
+    FLOAT_FORMAT = '%.15g'
+
+    def dictionary_path(self) -> str:
+        return os.path.join(self.directory, self.DICTIONARY)
+
+    def dictionary(self) -> dict[str, list[str]]:
+        if not os.path.exists(self.dictionary_path()):
+            return {column: [] for column in self.ENCODED}
+        return read_json(self.dictionary_path())
+
+    def save(self, name: str, df: pd.DataFrame):
+        # Ids novos entram no fim do dicionário: os códigos já gravados nas outras tabelas continuam válidos
+        dictionary = self.dictionary()
+        df = df.copy()
+        for column in self.ENCODED:
+            if column not in df.columns:
+                continue
+            values = dictionary.setdefault(column, [])
+            known = set(values)
+            values.extend(sorted(set(df[column].dropna()) - known))
+            codes = {value: code for code, value in enumerate(values)}
+            df[column] = df[column].map(codes).astype('Int64')
+        df = df.astype({column: 'Int64' for column in df.select_dtypes('integer').columns})
+
+        write_compressed(self.dictionary_path(), json.dumps(dictionary, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        write_compressed(self.path(name), df.to_csv(index=False, float_format=self.FLOAT_FORMAT).encode('utf-8'))
+
+    def load(self, name: str, columns: list[str] = None, seasons: list[int] = None) -> pd.DataFrame:
+        df = pd.read_csv(self.path(name), usecols=self._columns(columns, seasons))
+        dictionary = self.dictionary()
+        for column in self.ENCODED:
+            if column in df.columns:
+                df[column] = df[column].map(dict(enumerate(dictionary[column])))
+        return self._filter(apply_schema(name, df), columns, seasons)
+
+
+STORAGES = {
+    'csv': CsvStorage,
+    'parquet': ParquetStorage,
+    'feather': FeatherStorage,
+    'compact': CompactStorage,
+}
@@ -12,9 +12,38 @@ import * as d3 from 'd3';
 // static/data/**   (path absoluto na app)
 const DATA_PATH = '/data';
 
-export async function loadData(base) {
+/* -----------------------------------------------------------------------
+  * Formato compacto
+  * -----------------------------------------------------------------------
+  * Com --storage compact o DataBaseManager.save() grava também
+  * <tabela>.compact.csv, com os ids (driverId, constructorId, circuitId)
+  * trocados por códigos inteiros, e dictionary.json com código → id.
+  * Os .gz/.br ao lado servem para servidores que entregam arquivos
+  * pré-comprimidos; o fetch continua pedindo o arquivo puro.
+  * --------------------------------------------------------------------- */
+
+async function loadCompactTable(base, name, dictionary) {
+  const rows = await d3.csv(`${base}${DATA_PATH}/${name}.compact.csv`, d3.autoType);
+  const columns = Object.keys(dictionary).filter((c) => rows.columns.includes(c));
+  rows.forEach((d) => {
+    columns.forEach((c) => {
+      d[c] = d[c] === null ? null : dictionary[c][d[c]];
+    });
+  });
+  return rows;
+}
+
+async function loadTables(base, names, compact) {
+  if (!compact) {
+    return Promise.all(names.map((name) => d3.csv(`${base}${DATA_PATH}/${name}.csv`, d3.autoType)));
+  }
+  const dictionary = await d3.json(`${base}${DATA_PATH}/dictionary.json`);
+  return Promise.all(names.map((name) => loadCompactTable(base, name, dictionary)));
+}
+
+export async function loadData(base, { compact = false } = {}) {
   /* -----------------------------------------------------------------------
-    * 1. Lê todos os CSVs em paralelo
+    * 1. Lê todos os CSVs em paralelo (ou as versões compactas)
     * --------------------------------------------------------------------- */
   const [
     drivers,
@@ -22,13 +51,11 @@ export async function loadData(base) {
     constructors,
     constructorStandings,
     races
-  ] = await Promise.all([
-    d3.csv(`${base}${DATA_PATH}/drivers.csv`, d3.autoType),
-    d3.csv(`${base}${DATA_PATH}/driver_standings.csv`, d3.autoType),
-    d3.csv(`${base}${DATA_PATH}/constructors.csv`, d3.autoType),
-    d3.csv(`${base}${DATA_PATH}/constructor_standings.csv`, d3.autoType),
-    d3.csv(`${base}${DATA_PATH}/races.csv`, d3.autoType)
-  ]);
+  ] = await loadTables(
+    base,
+    ['drivers', 'driver_standings', 'constructors', 'constructor_standings', 'races'],
+    compact
+  );
 
   /* -----------------------------------------------------------------------
     * 2. Pré‑processamentos úteis
@@ -70,3 +97,44 @@ export async function loadData(base) {
     constructorNames
   };
 }
+
+/* -----------------------------------------------------------------------
+  * Carregamento por temporada
+  * -----------------------------------------------------------------------
+  * O DataBaseManager.save() gera static/data/seasons/<season>.json com
+  * corridas, pilotos, construtores e standings já com os nomes, além de
+  * um manifest.json com as temporadas disponíveis. Assim dá para buscar
+  * só a temporada exibida em vez de todos os CSVs.
+  * --------------------------------------------------------------------- */
+
+const seasonCache = new Map();
+
+export async function loadManifest(base) {
+  return d3.json(`${base}${DATA_PATH}/seasons/manifest.json`);
+}
+
+export async function loadSeason(base, season) {
+  if (!seasonCache.has(season)) {
+    seasonCache.set(
+      season,
+      d3.json(`${base}${DATA_PATH}/seasons/${season}.json`).then((bundle) => {
+        const { drivers, driverStandings, constructors, constructorStandings, races, snapshots } = bundle;
+        return {
+          season: bundle.season,
+          drivers,
+          driverStandings,
+          constructors,
+          constructorStandings,
+          races,
+          // rodada -> nome -> entidade, por modo: usado direto por getEntities
+          snapshots,
+
+          raceKeyMap: new Map(races.map((d) => [`${d.season}-${d.round}`, d])),
+          driverNames: new Map(drivers.map((d) => [d.driverId, `${d.givenName} ${d.familyName}`])),
+          constructorNames: new Map(constructors.map((d) => [d.constructorId, d.name]))
+        };
+      })
+    );
+  }
+  return seasonCache.get(season);
+}
@@ -28,36 +28,75 @@ export function getRounds(f1data, season) {
     .sort((a, b) => a - b);
 }
 
-export function getEntities(f1data, season, mode, round) {
+// Índice rodada -> nome -> entidade de cada (dados, temporada, modo), montado uma vez:
+// mover o slider de rodadas vira uma consulta direta em vez de filtrar os standings de novo
+const snapshotCache = new WeakMap();
+
+function entitySnapshot(entity, mode, drivers, constructors) {
+  let snapshot = {
+    name: entity[mode],
+    points: entity.points,
+    position: entity.position,
+    round: entity.round,
+    season: entity.season,
+    wins: entity.wins,
+  };
+
+  let driver = drivers.get(entity.driverId);
+  let constructor = constructors.get(entity.constructorId);
+  if (mode === 'driver') {
+    snapshot.id = driver?.driverId;
+    snapshot.url = driver?.url;
+    snapshot.dateOfBirth = driver?.dateOfBirth;
+    snapshot.nationality = driver?.nationality;
+    snapshot.constructor = constructor?.name;
+  } else if (mode === 'constructor') {
+    snapshot.id = constructor?.constructorId;
+    snapshot.url = constructor?.url;
+    snapshot.nationality = constructor?.nationality;
+  }
+  return snapshot;
+}
+
+function buildSnapshots(f1data, season, mode) {
   let standings = standingsBySeason(f1data, season, mode);
-  let entities = {};
-  [...new Set(standings.map((d) => d[mode]))].forEach((d) => {
-    let entity = standings.filter((e) => e[mode] === d && e.round == round)[0];
-    if (!entity) return;
-    entities[d] = {
-      name: entity[mode],
-      points: entity.points,
-      position: entity.position,
-      round: entity.round,
-      season: entity.season,
-      wins: entity.wins,
-    };
-  
-    let driver = f1data.drivers.filter((e) => e.driverId === entity.driverId)[0];
-    let constructor = f1data.constructors.filter((e) => e.constructorId === entity.constructorId)[0];
-    if (mode === 'driver') {
-      entities[d].id = driver.driverId;
-      entities[d].url = driver.url;
-      entities[d].dateOfBirth = driver.dateOfBirth;
-      entities[d].nationality = driver.nationality
-      entities[d].constructor = constructor.name;
-    } else if (mode === 'constructor') {
-      entities[d].id = constructor.constructorId;
-      entities[d].url = constructor.url;
-      entities[d].nationality = constructor.nationality;
-    }
+  let drivers = new Map(f1data.drivers.map((d) => [d.driverId, d]));
+  let constructors = new Map(f1data.constructors.map((d) => [d.constructorId, d]));
+
+  // Primeira linha de cada entidade em cada rodada
+  let rounds = new Map();
+  standings.forEach((d) => {
+    if (!rounds.has(d.round)) rounds.set(d.round, new Map());
+    let round = rounds.get(d.round);
+    if (!round.has(d[mode])) round.set(d[mode], d);
   });
-  return entities
+
+  // Em todas as rodadas, as entidades seguem a ordem em que aparecem na temporada (define as cores)
+  let names = [...new Set(standings.map((d) => d[mode]))];
+  let snapshots = {};
+  rounds.forEach((round, key) => {
+    snapshots[key] = {};
+    names.forEach((name) => {
+      if (round.has(name)) snapshots[key][name] = entitySnapshot(round.get(name), mode, drivers, constructors);
+    });
+  });
+  return snapshots;
+}
+
+function getSnapshots(f1data, season, mode) {
+  // Os bundles de temporada (loadSeason) já trazem o índice pronto, gerado pelo DataBaseManager.save()
+  if (f1data.snapshots && f1data.season === season) {
+    return f1data.snapshots[mode] ?? {};
+  }
+  if (!snapshotCache.has(f1data)) snapshotCache.set(f1data, new Map());
+  let cache = snapshotCache.get(f1data);
+  let key = `${season}-${mode}`;
+  if (!cache.has(key)) cache.set(key, buildSnapshots(f1data, season, mode));
+  return cache.get(key);
+}
+
+export function getEntities(f1data, season, mode, round) {
+  return getSnapshots(f1data, season, mode)[round] ?? {};
 }
 
 export function standingsBySeason(f1data, season, labelField) {
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+DATA_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'static', 'data')
+
+
+@pytest.fixture(scope='session')
+def data_folder() -> str:
+    return DATA_FOLDER
+
+
+@pytest.fixture(scope='session')
+def stand_in():
+    from manager.replay import StandInServer
+
+    with StandInServer(DATA_FOLDER) as server:
+        yield server
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pandas as pd
+import pytest
+
+from manager.bundles import FIRST_SEASON, season_bundle, season_snapshots
+from manager.storage import apply_schema
+
+STANDINGS_UTILS = os.path.join(os.path.dirname(__file__), '..', 'src', 'lib', 'standingsUtils.js')
+
+# Roda getEntities e standingsBySeason do app sobre os CSVs, como loadData() os entrega
+SCRIPT = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const { getEntities, getRounds, standingsBySeason } = await import(pathToFileURL(process.env.STANDINGS_UTILS));
+const { f1data, seasons } = JSON.parse(readFileSync(0, 'utf8'));
+const driverNames = new Map(f1data.drivers.map((d) => [d.driverId, `${d.givenName} ${d.familyName}`]));
+const constructorNames = new Map(f1data.constructors.map((d) => [d.constructorId, d.name]));
+f1data.driverStandings.forEach((d) => (d.driver = driverNames.get(d.driverId)));
+f1data.constructorStandings.forEach((d) => (d.constructor = constructorNames.get(d.constructorId)));
+const result = {};
+for (const season of seasons) {
+  result[season] = {};
+  for (const mode of ['driver', 'constructor']) {
+    const rounds = [...new Set(standingsBySeason(f1data, season, mode).map((d) => d.round))];
+    result[season][mode] = {
+      standings: standingsBySeason(f1data, season, mode).map((d) => [d.round, d[`${mode}Id`]]),
+      entities: Object.fromEntries(rounds.map((round) => [round, Object.entries(getEntities(f1data, season, mode, round))])),
+    };
+  }
+}
+process.stdout.write(JSON.stringify(result));
+'''
+
+
+def records(df: pd.DataFrame) -> list[dict]:
+    return json.loads(df.to_json(orient='records'))
+
+
+@pytest.fixture(scope='module')
+def dados(data_folder) -> dict[str, pd.DataFrame]:
+    names = ['drivers', 'constructors', 'races', 'driver_standings', 'constructor_standings']
+    return {name: apply_schema(name, pd.read_csv(os.path.join(data_folder, f'{name}.csv'))) for name in names}
+
+
+@pytest.fixture(scope='module')
+def app(dados) -> dict:
+    if shutil.which('node') is None:
+        pytest.skip('node is not installed')
+    seasons = sorted(int(season) for season in dados['driver_standings'].season.unique() if season >= FIRST_SEASON)
+    f1data = {
+        'drivers': records(dados['drivers']),
+        'constructors': records(dados['constructors']),
+        'races': records(dados['races']),
+        'driverStandings': records(dados['driver_standings']),
+        'constructorStandings': records(dados['constructor_standings']),
+    }
+    process = subprocess.run(
+        ['node', '--input-type=module', '-e', SCRIPT],
+        input=json.dumps({'f1data': f1data, 'seasons': seasons}), capture_output=True, text=True, check=True,
+        env={**os.environ, 'STANDINGS_UTILS': os.path.abspath(STANDINGS_UTILS)},
+    )
+    return json.loads(process.stdout)
+
+
+def test_snapshots_match_get_entities_values_and_order(dados, app):
+    seasons = [int(season) for season in app]
+    snapshots = season_snapshots(dados, seasons)
+    for season in seasons:
+        for mode in ['driver', 'constructor']:
+            expected = app[str(season)][mode]['entities']
+            built = snapshots[season][mode]
+            assert [str(round) for round in built] == list(expected)
+            for round, entities in built.items():
+                # Mesma ordem de entidades (cores e legenda) e mesmos valores
+                assert list(entities.items()) == [tuple(pair) for pair in expected[str(round)]], (season, mode, round)
+
+
+def test_bundle_standings_keep_the_csv_order(dados, app):
+    for season in [int(season) for season in app][-3:]:
+        bundle = season_bundle(dados, season)
+        for mode, key in [('driver', 'driverStandings'), ('constructor', 'constructorStandings')]:
+            assert [[row['round'], row[f'{mode}Id']] for row in bundle[key]] == app[str(season)][mode]['standings']
@@ -0,0 +1,87 @@
+import argparse
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pytest
+import requests
+
+from manager.database import DataBaseManager, Ergast, add_arguments
+from manager.instrumentation import Instrumentation
+
+
+@pytest.fixture(scope='module')
+def archive(stand_in) -> bytes:
+    return requests.get(stand_in.ergast_url, timeout=60).content
+
+
+def test_ergast_download_accepts_the_expected_sha256(tmp_path, stand_in, archive):
+    sha256 = hashlib.sha256(archive).hexdigest()
+    Ergast.download(str(tmp_path), sha256=sha256.upper(), session=stand_in.session(), instrumentation=Instrumentation(quiet=True))
+    assert os.listdir(tmp_path) == [Ergast.ARCHIVE]
+    assert Ergast.read_csv(str(tmp_path), 'drivers').shape[0] > 0
+
+
+def test_ergast_download_fails_on_another_sha256(tmp_path, stand_in):
+    with pytest.raises(IOError, match='Checksum verification failed'):
+        Ergast.download(str(tmp_path), sha256='0' * 64, session=stand_in.session(), instrumentation=Instrumentation(quiet=True))
+    assert os.listdir(tmp_path) == []
+
+
+def test_an_archive_left_by_a_previous_run_is_checked_again(tmp_path, stand_in, archive):
+    with open(tmp_path / Ergast.ARCHIVE, 'wb') as file:
+        file.write(archive[:-1] + b'\0')
+    sha256 = hashlib.sha256(archive).hexdigest()
+    Ergast.download(str(tmp_path), sha256=sha256, session=stand_in.session(), instrumentation=Instrumentation(quiet=True))
+    with open(tmp_path / Ergast.ARCHIVE, 'rb') as file:
+        assert file.read() == archive
+
+
+def test_ergast_sha256_option_reaches_the_download(tmp_path, monkeypatch):
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args(['create', str(tmp_path), '--ergast-sha256', 'abc'])
+    database = DataBaseManager(str(tmp_path), ergast_sha256=args.ergast_sha256, instrumentation=Instrumentation(quiet=True))
+
+    def download(folder, sha256=None, **kwargs):
+        raise RuntimeError(sha256)
+
+    monkeypatch.setattr(Ergast, 'download', download)
+    with pytest.raises(RuntimeError, match='abc'):
+        database.load_ergast()
+
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_update_adds_the_missing_rounds_drivers_and_races(tmp_path, stand_in, data_folder):
+    # Tira da cópia os rounds 3+ da última temporada e os pilotos que só correram nela
+    directory = str(tmp_path / 'data')
+    shutil.copytree(data_folder, directory)
+    tables = {name: pd.read_csv(os.path.join(directory, f'{name}.csv')) for name in DataBaseManager(directory).df_names}
+    last = tables['races'].season.max()
+    standings = tables['driver_standings']
+    newcomers = set(standings[standings.season == last].driverId) - set(standings[standings.season < last].driverId)
+    assert newcomers
+    trimmed = {
+        'races': tables['races'][tables['races'].season < last],
+        'drivers': tables['drivers'][~tables['drivers'].driverId.isin(newcomers)],
+    }
+    for name in ['constructor_standings', 'driver_standings']:
+        table = tables[name]
+        trimmed[name] = table[(table.season < last) | ((table.season == last) & (table['round'] <= 2))]
+    for name, table in trimmed.items():
+        table.to_csv(os.path.join(directory, f'{name}.csv'), index=False)
+
+    database = DataBaseManager(directory, session=stand_in.session(), instrumentation=Instrumentation(quiet=True))
+    database.update()
+
+    for name, table in tables.items():
+        updated = pd.read_csv(os.path.join(directory, f'{name}.csv'))
+        assert len(updated) == len(table), name
+        assert list(updated.columns) == list(table.columns), name
+    drivers = pd.read_csv(os.path.join(directory, 'drivers.csv')).set_index('driverId')
+    assert drivers.loc[sorted(newcomers), 'driverIdErgast'].isna().all()
+    expected = tables['drivers'].set_index('driverId').loc[sorted(newcomers), ['givenName', 'familyName']]
+    assert drivers.loc[sorted(newcomers), ['givenName', 'familyName']].equals(expected)
+    races = pd.read_csv(os.path.join(directory, 'races.csv'))
+    assert races[races.season == last]['round'].tolist() == tables['races'][tables['races'].season == last]['round'].tolist()
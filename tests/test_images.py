@@ -0,0 +1,83 @@
+import json
+
+import pandas as pd
+import pytest
+
+from manager import images
+from manager.instrumentation import Instrumentation
+
+PAGE = 'https://en.wikipedia.org/wiki/Fernando_Alonso'
+
+
+@pytest.fixture
+def refresh(tmp_path, stand_in, monkeypatch):
+    monkeypatch.setattr(images, 'session', stand_in.session())
+    folder = tmp_path / 'drivers'
+
+    def refresh() -> dict:
+        manifest = images.ImageManifest(str(tmp_path / 'manifest.json'))
+        images.process_images({'alonso': images.driver_source(PAGE)}, str(folder), manifest=manifest)
+        manifest.save()
+        return manifest.get('drivers/alonso')
+    return refresh
+
+
+def moved_image(stand_in, monkeypatch):
+    # A página passa a apontar para outra imagem
+    page = stand_in.data.driver_page('Fernando_Alonso').replace('Fernando_Alonso.jpg', 'Fernando_Alonso_2024.jpg')
+    monkeypatch.setattr(stand_in.data, 'driver_page', lambda name: page)
+
+
+def test_unchanged_page_and_image_are_not_downloaded_again(refresh, monkeypatch):
+    first = refresh()
+    assert first['url'].endswith('/Fernando_Alonso.jpg') and first['page_etag'] and first['output_sha256']
+    monkeypatch.setattr(images, 'render_image', lambda *args: pytest.fail('unchanged image rendered again'))
+    assert refresh() == first
+
+
+def test_failed_download_keeps_the_previous_page_validators(refresh, tmp_path, stand_in, monkeypatch):
+    first = refresh()
+    png = (tmp_path / 'drivers' / 'alonso.png').read_bytes()
+
+    moved_image(stand_in, monkeypatch)
+    with monkeypatch.context() as patch:
+        def fail(*args):
+            raise IOError('offline')
+        patch.setattr(images, 'fetch_image', fail)
+        assert refresh() == first
+    assert json.loads((tmp_path / 'manifest.json').read_text())['drivers/alonso'] == first
+
+    # A próxima execução ainda vê a página como alterada e baixa a imagem nova
+    second = refresh()
+    assert second['url'].endswith('/Fernando_Alonso_2024.jpg')
+    assert second['page_etag'] != first['page_etag']
+    assert (tmp_path / 'drivers' / 'alonso.png').read_bytes() != png
+
+
+def test_quiet_image_refresh_writes_nothing_to_the_terminal(tmp_path, stand_in, data_folder, monkeypatch, capsys):
+    monkeypatch.setattr(images, 'session', stand_in.session())
+    # Uma equipe sem logo e um piloto cuja imagem não baixa: as duas mensagens só aparecem fora do modo quiet
+    monkeypatch.setattr(stand_in.data, 'logo_page', lambda query: '<html><body></body></html>')
+    fetch_image = images.fetch_image
+
+    def fetch(url, id, entry=None):
+        if id == 'nobody':
+            raise IOError('offline')
+        return fetch_image(url, id, entry)
+
+    monkeypatch.setattr(images, 'fetch_image', fetch)
+    dados = {
+        'drivers': pd.DataFrame({'driverId': ['alonso', 'nobody'], 'url': [PAGE, 'https://en.wikipedia.org/wiki/Nobody']}),
+        'driver_standings': pd.DataFrame({'season': [2024, 2024], 'driverId': ['alonso', 'nobody']}),
+        'constructors': pd.DataFrame({'constructorId': ['unknown'], 'name': ['No Such Team']}),
+        'constructor_standings': pd.DataFrame({'season': [2024], 'constructorId': ['unknown']}),
+    }
+    images.update_images(data_folder, str(tmp_path), dados=dados, instrumentation=Instrumentation(quiet=True))
+    assert capsys.readouterr() == ('', '')
+    assert (tmp_path / 'drivers' / 'alonso.png').exists()
+
+    images.update_images(data_folder, str(tmp_path / 'verbose'), dados=dados, instrumentation=Instrumentation())
+    out = capsys.readouterr().out
+    assert 'Error on download for nobody: offline' in out
+    assert 'Image not found for unknown' in out
+    assert 'Published images version 1' in out
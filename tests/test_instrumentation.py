@@ -0,0 +1,31 @@
+import json
+import os
+
+from manager.instrumentation import Instrumentation, report
+
+
+def test_reports_replace_the_destination_only_when_the_run_closes(tmp_path):
+    lines, metrics = str(tmp_path / 'run.jsonl'), str(tmp_path / 'run.prom')
+    for path in (lines, metrics):
+        with open(path, 'w') as f:
+            f.write('previous\n')
+    instrumentation = Instrumentation(quiet=True, reports=[report(lines), report(metrics)])
+    with instrumentation.stage('drivers') as info:
+        info['rows'] = 3
+    instrumentation.request('drivers', status=200, bytes=10, seconds=0.5)
+
+    # Enquanto a execução corre, os relatórios anteriores continuam inteiros
+    for path in (lines, metrics):
+        with open(path) as f:
+            assert f.read() == 'previous\n'
+    assert os.path.exists(lines + '.tmp')
+
+    instrumentation.close('create')
+    with open(lines) as f:
+        events = [json.loads(line) for line in f]
+    assert [event['event'] for event in events] == ['stage', 'request', 'run']
+    assert events[0]['rows'] == 3
+    with open(metrics) as f:
+        content = f.read()
+    assert 'f1db_stage_rows{stage="drivers"} 3' in content and content.endswith('# EOF\n')
+    assert sorted(os.listdir(tmp_path)) == ['run.jsonl', 'run.prom']
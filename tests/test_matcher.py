@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+
+from manager.matcher import Matcher, load_overrides, normalize
+
+
+def matcher(overrides: dict = None) -> Matcher:
+    return Matcher('drivers', overrides={'drivers': overrides or {}}, log=lambda message: None)
+
+
+def pairs(left: pd.DataFrame, right: pd.DataFrame, overrides: dict = None) -> dict:
+    found = matcher(overrides).pairs(left, right, 'ergast', 'jolpica', name='name', block='born')
+    return {left['ergast'].iat[i]: (right['jolpica'].iat[j], method) for i, j, method in found}
+
+
+def test_normalize_folds_accents_case_punctuation_and_suffixes():
+    assert normalize('Nelson Piquet Jr.') == 'nelson piquet'
+    assert normalize('  Kimi RÄIKKÖNEN ') == 'kimi raikkonen'
+    assert normalize('Jean-Éric Vergne') == 'jean eric vergne'
+    assert normalize(None) == ''
+
+
+def test_exact_key_within_block_then_across_blocks():
+    left = pd.DataFrame({'ergast': [1, 2, 3], 'name': ['Sergio Pérez', 'Max Verstappen', 'Lewis Hamilton'],
+                         'born': ['1990-01-26', '1997-09-30', '1985-01-07']})
+    right = pd.DataFrame({'jolpica': ['perez', 'max_verstappen', 'hamilton'], 'name': ['Sergio Perez', 'Max Verstappen', 'Lewis Hamilton'],
+                          'born': ['1990-01-26', '1997-09-30', '1985-01-08']})
+    assert pairs(left, right) == {1: ('perez', 'exact'), 2: ('max_verstappen', 'exact'), 3: ('hamilton', 'exact')}
+
+
+def test_fuzzy_only_inside_the_block_and_with_a_clear_winner():
+    left = pd.DataFrame({'ergast': [1, 2, 3], 'name': ['Michael Schumacher', 'Ralf Schumaker', 'Jos Verstappen'],
+                         'born': ['1969-01-03', '1975-06-30', '1972-03-04']})
+    right = pd.DataFrame({'jolpica': ['michael_schumacher', 'ralf_schumacher', 'verstappen'],
+                          'name': ['Michael Schumaher', 'Ralf Schumacher', 'Jos Verstapen'],
+                          'born': ['1969-01-03', '1975-06-30', '1999-01-01']})
+    assert pairs(left, right) == {1: ('michael_schumacher', 'fuzzy'), 2: ('ralf_schumacher', 'fuzzy')}
+
+
+def test_ambiguous_fuzzy_candidates_are_left_unmatched():
+    left = pd.DataFrame({'ergast': [1], 'name': ['Jan Smith'], 'born': ['1950-01-01']})
+    right = pd.DataFrame({'jolpica': ['smith_a', 'smith_b'], 'name': ['Jan Smiths', 'Jan Smithe'], 'born': ['1950-01-01', '1950-01-01']})
+    assert pairs(left, right) == {}
+
+
+def test_overrides_force_or_block_a_match():
+    left = pd.DataFrame({'ergast': [1, 2], 'name': ['Someone Else', 'Lewis Hamilton'], 'born': ['1985-01-07', '1985-01-07']})
+    right = pd.DataFrame({'jolpica': ['hamilton', 'other'], 'name': ['Lewis Hamilton', 'Lewis Hamilton'], 'born': ['1985-01-07', '1960-01-01']})
+    assert pairs(left, right, {'1': 'hamilton', '2': None}) == {1: ('hamilton', 'override')}
+
+
+def test_match_keeps_unmatched_rows_from_both_sides_and_left_values():
+    left = pd.DataFrame({'ergast': [1, 2], 'name': ['Ayrton Senna', 'Alain Prost'], 'born': ['1960-03-21', '1955-02-24']})
+    right = pd.DataFrame({'jolpica': ['senna', 'piastri'], 'name': ['Ayrton Senna', 'Oscar Piastri'], 'born': ['1960-03-21', '2001-04-06'],
+                          'code': ['SEN', 'PIA']})
+    matched = matcher().match(left, right, 'ergast', 'jolpica', name='name', block='born')
+    assert list(matched.columns) == ['ergast', 'name', 'born', 'jolpica', 'code']
+    assert matched.astype(object).where(matched.notna(), None).values.tolist() == [
+        [2, 'Alain Prost', '1955-02-24', None, None],
+        [1, 'Ayrton Senna', '1960-03-21', 'senna', 'SEN'],
+        [None, 'Oscar Piastri', '2001-04-06', 'piastri', 'PIA'],
+    ]
+
+
+def test_shipped_drivers_and_constructors_resolve_to_their_ids(data_folder):
+    drivers = pd.read_csv(os.path.join(data_folder, 'drivers.csv')).dropna(subset=['driverIdErgast'])
+    drivers['name'] = drivers.givenName + ' ' + drivers.familyName
+    found = matcher().pairs(drivers[['driverIdErgast', 'name', 'dateOfBirth']], drivers[['driverId', 'name', 'dateOfBirth']],
+                            'driverIdErgast', 'driverId', name='name', block='dateOfBirth')
+    assert sorted((drivers.driverIdErgast.iat[i], drivers.driverId.iat[j]) for i, j, _ in found) \
+        == sorted(zip(drivers.driverIdErgast, drivers.driverId))
+
+    constructors = pd.read_csv(os.path.join(data_folder, 'constructors.csv'))
+    found = Matcher('constructors', overrides={}, log=lambda message: None).pairs(
+        constructors, constructors.drop(columns='constructorIdErgast'),
+        'constructorIdErgast', 'constructorId', name='name', block='nationality',
+    )
+    assert sorted((constructors.constructorIdErgast.iat[i], constructors.constructorId.iat[j]) for i, j, _ in found) \
+        == sorted(zip(constructors.constructorIdErgast, constructors.constructorId))
+
+
+def test_shipped_overrides_cover_every_kind():
+    overrides = load_overrides()
+    assert set(overrides) == {'drivers', 'constructors', 'circuits'}
+    assert all(isinstance(target, (str, type(None))) for table in overrides.values() for target in table.values())
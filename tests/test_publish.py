@@ -0,0 +1,177 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from manager import publish as release
+from manager.files import read_json, replacing, write_bytes, write_json
+from manager.publish import DELTAS, RELEASE, load_release, publish, table_delta
+
+KEYS = ['season', 'round', 'driverId']
+
+
+def standings(*rows) -> pd.DataFrame:
+    return pd.DataFrame(list(rows), columns=KEYS + ['points'])
+
+
+def apply(old: pd.DataFrame, delta: dict) -> pd.DataFrame:
+    # Como um cliente aplica o delta de uma tabela
+    if delta.get('replace') is not None:
+        return pd.DataFrame(delta['replace'])
+    keys = delta['keys']
+    rows = {tuple(row[key] for key in keys): row for row in json.loads(old.to_json(orient='records'))}
+    for row in delta['delete']:
+        rows.pop(tuple(row[key] for key in keys))
+    for row in delta['upsert']:
+        rows[tuple(row[key] for key in keys)] = row
+    return pd.DataFrame(list(rows.values()))
+
+
+def normalized(df: pd.DataFrame) -> list[dict]:
+    return sorted(json.loads(df.to_json(orient='records')), key=lambda row: tuple(row[key] for key in KEYS))
+
+
+def test_table_delta_upserts_changed_rows_and_deletes_removed_keys():
+    old = standings((2024, 1, 'max', 25), (2024, 1, 'lando', 18), (2024, 1, 'oscar', 15))
+    new = standings((2024, 1, 'max', 25), (2024, 1, 'lando', 19), (2024, 2, 'max', 50))
+    delta = table_delta(old, new, KEYS)
+    assert delta['keys'] == KEYS
+    assert sorted(delta['upsert'], key=lambda row: (row['round'], row['driverId'])) == [
+        {'season': 2024, 'round': 1, 'driverId': 'lando', 'points': 19},
+        {'season': 2024, 'round': 2, 'driverId': 'max', 'points': 50},
+    ]
+    assert delta['delete'] == [{'season': 2024, 'round': 1, 'driverId': 'oscar'}]
+    assert normalized(apply(old, delta)) == normalized(new)
+
+
+def test_table_delta_is_empty_for_the_same_table():
+    old = standings((2024, 1, 'max', 25), (2024, 1, 'lando', 18))
+    delta = table_delta(old, old.iloc[::-1].reset_index(drop=True), KEYS)
+    assert delta == {'keys': KEYS, 'upsert': [], 'delete': []}
+
+
+def test_table_delta_upserts_rows_when_a_column_is_added():
+    old = standings((2024, 1, 'max', 25))
+    new = old.assign(wins=1)
+    delta = table_delta(old, new, KEYS)
+    assert delta['upsert'] == [{'season': 2024, 'round': 1, 'driverId': 'max', 'points': 25, 'wins': 1}]
+    assert delta['delete'] == []
+
+
+def test_table_delta_replaces_the_table_when_keys_repeat():
+    old = standings((2024, 1, 'max', 25))
+    new = standings((2024, 1, 'max', 25), (2024, 1, 'max', 26))
+    delta = table_delta(old, new, KEYS)
+    assert delta == {'keys': KEYS, 'replace': json.loads(new.to_json(orient='records'))}
+    assert 'upsert' not in delta and 'delete' not in delta
+    assert normalized(apply(old, delta)) == normalized(new)
+
+
+def write(directory, relative: str, content: str):
+    path = os.path.join(directory, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_publish_versions_only_on_changes(tmp_path):
+    directory = str(tmp_path)
+    write(directory, 'drivers.csv', 'driverId\nmax\n')
+    write(directory, 'images/drivers/max.webp', 'image')
+    assert publish(directory) == 1
+    first = load_release(directory)
+    assert first['deltas'] == []
+    assert set(first['files']) == {'drivers.csv', 'images/drivers/max.webp'}
+    assert first['files']['drivers.csv']['size'] == len('driverId\nmax\n')
+    assert {entry['version'] for entry in first['files'].values()} == {1}
+    assert not os.path.exists(os.path.join(directory, DELTAS))
+
+    # Salvar de novo sem mudanças mantém a versão e o próprio release.json
+    with open(os.path.join(directory, RELEASE), 'rb') as f:
+        content = f.read()
+    assert publish(directory) == 1
+    with open(os.path.join(directory, RELEASE), 'rb') as f:
+        assert f.read() == content
+
+    write(directory, 'drivers.csv', 'driverId\nmax\nlando\n')
+    os.remove(os.path.join(directory, 'images', 'drivers', 'max.webp'))
+    write(directory, 'constructors.csv', 'constructorId\nmclaren\n')
+    tables = {
+        'drivers': {'keys': ['driverId'], 'upsert': [{'driverId': 'lando'}], 'delete': []},
+        'circuits': {'keys': ['circuitId'], 'upsert': [], 'delete': []},
+    }
+    assert publish(directory, tables) == 2
+    second = load_release(directory)
+    assert second['deltas'] == [2]
+    assert second['files']['drivers.csv']['version'] == 2
+    assert second['files']['constructors.csv']['version'] == 2
+    assert 'images/drivers/max.webp' not in second['files']
+    delta = read_json(os.path.join(directory, DELTAS, '2.json'))
+    assert delta == {
+        'from': 1,
+        'to': 2,
+        'changed': ['constructors.csv', 'drivers.csv'],
+        'removed': ['images/drivers/max.webp'],
+        # Tabelas sem mudanças ficam fora do delta
+        'tables': {'drivers': tables['drivers']},
+    }
+
+    # Só a tabela mudou (o CSV é o mesmo): ainda é uma nova versão
+    assert publish(directory, {'drivers': {'keys': ['driverId'], 'replace': [{'driverId': 'max'}]}}) == 3
+    third = load_release(directory)
+    assert third['files']['drivers.csv']['version'] == 2
+    assert third['deltas'] == [2, 3]
+
+
+def test_publish_skips_hidden_compressed_temporary_and_excluded_files(tmp_path):
+    directory = str(tmp_path)
+    write(directory, 'drivers.csv', 'driverId\nmax\n')
+    write(directory, 'drivers.csv.gz', 'compressed')
+    write(directory, 'drivers.csv.br', 'compressed')
+    write(directory, 'drivers.csv.tmp', 'partial')
+    write(directory, '.hidden', 'hidden')
+    write(directory, '.checkpoints/drivers.pkl', 'checkpoint')
+    write(directory, 'images/manifest.json', '{}')
+    publish(directory, exclude=['images/manifest.json'])
+    assert set(load_release(directory)['files']) == {'drivers.csv'}
+
+    # Mudanças nos arquivos ignorados não geram versão
+    write(directory, 'drivers.csv.tmp', 'partial again')
+    write(directory, '.checkpoints/drivers.pkl', 'new checkpoint')
+    write(directory, 'images/manifest.json', '{"max": {}}')
+    assert publish(directory, exclude=['images/manifest.json']) == 1
+
+
+def test_publish_prunes_old_deltas(tmp_path, monkeypatch):
+    monkeypatch.setattr(release, 'MAX_DELTAS', 3)
+    directory = str(tmp_path)
+    for version in range(1, 7):
+        write(directory, 'drivers.csv', f'driverId\n{version}\n')
+        assert publish(directory) == version
+    assert load_release(directory)['deltas'] == [4, 5, 6]
+    assert sorted(os.listdir(os.path.join(directory, DELTAS))) == ['4.json', '5.json', '6.json']
+
+
+def test_write_json_skips_unchanged_content(tmp_path):
+    path = str(tmp_path / 'data.json')
+    assert write_json(path, {'name': 'Pérez', 'points': [1, 2]})
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '{"name":"Pérez","points":[1,2]}'
+    assert not write_json(path, {'name': 'Pérez', 'points': [1, 2]})
+    assert write_json(path, {'b': 1, 'a': 2}, indent=1, sort_keys=True)
+    assert read_json(path) == {'a': 2, 'b': 1}
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_replacing_keeps_the_previous_file_on_errors(tmp_path):
+    path = str(tmp_path / 'data.bin')
+    write_bytes(path, b'previous')
+    with pytest.raises(RuntimeError):
+        with replacing(path) as temporary:
+            with open(temporary, 'wb') as f:
+                f.write(b'partial')
+            raise RuntimeError
+    with open(path, 'rb') as f:
+        assert f.read() == b'previous'
+    assert os.listdir(tmp_path) == ['data.bin']
@@ -0,0 +1,124 @@
+import os
+
+import pandas as pd
+import pytest
+
+from manager.database import DataBaseManager
+from manager.instrumentation import Instrumentation
+from manager.standings import RESULTS_COLUMNS, RESULTS_DTYPES, compute, disagreements, results_records
+
+
+def results(rows: list[tuple]) -> pd.DataFrame:
+    # (round, driverId, position, positionText, points, sprint)
+    return pd.DataFrame(
+        [(2020, round, driver, 'team', points, position, text, sprint) for round, driver, position, text, points, sprint in rows],
+        columns=RESULTS_COLUMNS,
+    ).astype(RESULTS_DTYPES)
+
+
+def standings(table: pd.DataFrame, round: int) -> list[tuple]:
+    table = table[table['round'] == round].sort_values('position')
+    return list(zip(table.driverId, table.points, table.position, table.wins))
+
+
+def test_results_records_keep_the_classification_text():
+    response = {'MRData': {'RaceTable': {'Races': [{'season': '2020', 'round': '3', 'Results': [
+        {'position': '1', 'positionText': '1', 'points': '25', 'Driver': {'driverId': 'a'}, 'Constructor': {'constructorId': 'x'}},
+        {'position': '20', 'positionText': 'R', 'points': '0', 'Driver': {'driverId': 'b'}, 'Constructor': {'constructorId': 'y'}},
+    ]}]}}}
+    assert [(r['driverId'], r['position'], r['positionText']) for r in results_records(response, sprint=False)] == [
+        ('a', 1, '1'), ('b', 20, 'R'),
+    ]
+
+
+def test_countback_only_counts_classified_race_finishes():
+    table = compute(results([
+        (1, 'a', 1, '1', 10, False), (1, 'c', 2, 'R', 0, False), (1, 'b', 3, '3', 5, False), (1, 'd', 4, '4', 0, False),
+        (2, 'b', 1, '1', 10, False), (2, 'a', 2, '2', 5, False), (2, 'd', 3, '3', 0, False), (2, 'c', 4, 'D', 0, False),
+        # Posição na sprint não conta no desempate, só os pontos
+        (2, 'c', 1, '1', 0, True),
+    ]), 'driverId')
+    assert standings(table, 1) == [('a', 10, 1, 1), ('b', 5, 2, 0), ('d', 0, 3, 0), ('c', 0, 4, 0)]
+    assert standings(table, 2) == [('a', 15, 1, 1), ('b', 15, 2, 1), ('d', 0, 3, 0), ('c', 0, 4, 0)]
+
+
+def test_sprint_points_count_and_entities_stay_after_their_first_round():
+    table = compute(results([
+        (1, 'a', 1, '1', 25, False),
+        (2, 'a', 2, '2', 18, False), (2, 'b', 1, '1', 25, False), (2, 'b', 1, '1', 8, True),
+    ]), 'driverId')
+    assert standings(table, 1) == [('a', 25, 1, 1)]
+    assert standings(table, 2) == [('a', 43, 1, 1), ('b', 33, 2, 1)]
+
+
+def test_disagreements_compare_every_round_the_api_returned():
+    computed = pd.DataFrame({
+        'season': [2020] * 4, 'round': [1, 1, 2, 2], 'driverId': ['a', 'b', 'a', 'b'],
+        'points': [10.0, 10.0, 20.0, 15.0], 'position': [1, 2, 1, 2], 'wins': [1, 0, 1, 0],
+    })
+    api = computed.assign(position=[2, 1, 1, 2])
+    assert disagreements(computed, api[api['round'] == 2], 'driverId') == set()
+    assert disagreements(computed, api, 'driverId') == {2020}
+    assert disagreements(computed, api.assign(wins=[1, 0, 2, 0]), 'driverId') == {2020}
+
+
+class Fetch:
+
+    def __init__(self, api: pd.DataFrame):
+        self.api = api
+        self.calls = []
+
+    def __call__(self, season_races: list[tuple[int, int]]) -> pd.DataFrame:
+        self.calls.append(sorted(season_races))
+        keys = pd.DataFrame(season_races, columns=['season', 'round'], dtype='int64')
+        return self.api.merge(keys, on=['season', 'round'])
+
+
+@pytest.fixture
+def database(tmp_path) -> DataBaseManager:
+    return DataBaseManager(str(tmp_path), instrumentation=Instrumentation(quiet=True))
+
+
+def season(year: int, positions: list[int]) -> pd.DataFrame:
+    # Dois rounds; no primeiro os dois pilotos empatam em pontos
+    return pd.DataFrame({
+        'season': [year] * 4, 'round': [1, 1, 2, 2], 'driverId': ['a', 'b', 'a', 'b'], 'constructorId': ['x', 'y', 'x', 'y'],
+        'points': [10.0, 10.0, 20.0, 15.0], 'position': positions, 'wins': [1, 0, 1, 0],
+    }).astype(DataBaseManager.STANDINGS_DTYPES)
+
+
+def test_computed_rounds_are_kept_when_the_spot_check_agrees(database):
+    api = pd.concat([season(2021, [1, 2, 1, 2]), season(2022, [1, 2, 1, 2])], ignore_index=True)
+    fetch = Fetch(api)
+    season_races = [(2021, 1), (2021, 2), (2022, 1), (2022, 2)]
+    table = database.computed_standings(api, api[api['round'] == 2], 'driverId', season_races, fetch)
+    # Só a última temporada é buscada rodada a rodada
+    assert fetch.calls == [[(2022, 1), (2022, 2)], []]
+    pd.testing.assert_frame_equal(table.sort_values(['season', 'round', 'driverId'], ignore_index=True), api)
+
+
+def test_a_mid_season_position_difference_falls_back_to_every_round(database):
+    computed = pd.concat([season(2021, [1, 2, 1, 2]), season(2022, [1, 2, 1, 2])], ignore_index=True)
+    api = pd.concat([season(2021, [2, 1, 1, 2]), season(2022, [2, 1, 1, 2])], ignore_index=True)
+    fetch = Fetch(api)
+    season_races = [(2021, 1), (2021, 2), (2022, 1), (2022, 2)]
+    # A última rodada bate: só a conferência rodada a rodada encontra a diferença
+    table = database.computed_standings(computed, api[api['round'] == 2], 'driverId', season_races, fetch)
+    assert fetch.calls == [[(2022, 1), (2022, 2)], [(2021, 1), (2021, 2)]]
+    pd.testing.assert_frame_equal(table.sort_values(['season', 'round', 'driverId'], ignore_index=True), api)
+
+
+def test_create_through_the_stand_in_matches_the_per_round_standings(tmp_path, stand_in, data_folder):
+    database = DataBaseManager(str(tmp_path), workers=8, session=stand_in.session(), instrumentation=Instrumentation(quiet=True))
+    database.jolpica.buckets = []
+    database.create(restart=True)
+
+    for table, entity in [('driver_standings', 'driverId'), ('constructor_standings', 'constructorId')]:
+        expected = pd.read_csv(os.path.join(data_folder, f'{table}.csv'))
+        built = pd.read_csv(os.path.join(tmp_path, f'{table}.csv'))
+        both = built.merge(expected, on=['season', 'round', entity], suffixes=('', '_api'), how='outer', indicator=True)
+        both = both[both.season > stand_in.data.ergast_last_season]
+        assert (both['_merge'] == 'both').all()
+        assert (both.position == both.position_api).all()
+        assert (both.points == both.points_api).all()
+        assert (both.wins == both.wins_api).all()
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.validate import blank_positions, legacy_tratar_posicoes
+from manager.database import DataBaseManager
+from manager.instrumentation import Instrumentation
+
+
+def validate(tmp_path, driver_standings: pd.DataFrame, constructor_standings: pd.DataFrame):
+    database = DataBaseManager(str(tmp_path), instrumentation=Instrumentation(quiet=True))
+    database.dados = {'driver_standings': driver_standings, 'constructor_standings': constructor_standings}
+    database.validate()
+    return database.dados['driver_standings'], database.dados['constructor_standings']
+
+
+def test_fills_missing_positions_after_the_last_known(tmp_path):
+    standings = pd.DataFrame({
+        'season': [2020] * 4 + [2021] * 2,
+        'round': [1] * 4 + [1] * 2,
+        'driverId': ['a', 'b', 'c', 'd', 'a', 'b'],
+        'position': [2, np.nan, 1, np.nan, 1, 2],
+    })
+    drivers, _ = validate(tmp_path, standings, standings.head(0))
+    assert drivers[['season', 'driverId', 'position']].values.tolist() == [
+        [2020, 'c', 1.0], [2020, 'a', 2.0], [2020, 'b', 3.0], [2020, 'd', 4.0],
+        [2021, 'a', 1.0], [2021, 'b', 2.0],
+    ]
+
+
+def test_complete_standings_are_left_untouched(tmp_path):
+    standings = pd.DataFrame({'season': [2020, 2020], 'round': [1, 1], 'driverId': ['b', 'a'], 'position': [2, 1]})
+    drivers, _ = validate(tmp_path, standings.copy(), standings.head(0))
+    pd.testing.assert_frame_equal(drivers, standings)
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_matches_the_groupby_apply_implementation(tmp_path, data_folder, shuffle):
+    driver_standings = blank_positions(pd.read_csv(os.path.join(data_folder, 'driver_standings.csv')), 1)
+    constructor_standings = blank_positions(pd.read_csv(os.path.join(data_folder, 'constructor_standings.csv')), 2)
+    if shuffle:
+        driver_standings = driver_standings.sample(frac=1, random_state=3)
+        constructor_standings = constructor_standings.sample(frac=1, random_state=4)
+
+    drivers, constructors = validate(tmp_path, driver_standings.copy(), constructor_standings.copy())
+
+    pd.testing.assert_frame_equal(drivers, legacy_tratar_posicoes(driver_standings.copy()))
+    pd.testing.assert_frame_equal(constructors, legacy_tratar_posicoes(constructor_standings.copy()))